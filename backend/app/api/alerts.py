@@ -0,0 +1,64 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.models.item import ProductInventory, StockThreshold
+from app.schemas.alerts import Alert, StockThresholdBase
+from app.database import get_db
+from app.services.alerts import alert_engine
+
+# Paths carry the /alerts prefix themselves: APIRouter(prefix=...) is not
+# applied to WebSocket routes in the FastAPI version we pin
+router = APIRouter()
+
+@router.get("/alerts/", response_model=List[Alert])
+def get_alerts(priority: Optional[str] = None, db: Session = Depends(get_db)):
+    alert_engine.ensure_loaded(db)
+    return alert_engine.alerts(priority)
+
+@router.get("/alerts/thresholds", response_model=List[StockThresholdBase])
+def get_thresholds(db: Session = Depends(get_db)):
+    return [StockThresholdBase.from_orm(t) for t in db.query(StockThreshold).all()]
+
+@router.put("/alerts/thresholds", response_model=StockThresholdBase)
+def set_threshold(threshold: StockThresholdBase, db: Session = Depends(get_db)):
+    if threshold.ProductID is not None and db.query(ProductInventory.ProductID).filter(
+        ProductInventory.ProductID == threshold.ProductID
+    ).first() is None:
+        raise HTTPException(status_code=404, detail=f"Product {threshold.ProductID} not found")
+    alert_engine.ensure_loaded(db)
+    stored = alert_engine.set_threshold(
+        db, threshold.critical, threshold.warning, product_id=threshold.ProductID, category=threshold.Category
+    )
+    return StockThresholdBase.from_orm(stored)
+
+@router.websocket("/alerts/ws")
+async def alerts_ws(websocket: WebSocket, db: Session = Depends(get_db)):
+    # Sends the current alerts, then one message per raised/updated/resolved alert
+    await websocket.accept()
+    alert_engine.ensure_loaded(db)
+    db.close()
+    queue = alert_engine.subscribe(asyncio.get_event_loop())
+    # Watch for the client going away while waiting for the next alert
+    receiver = asyncio.ensure_future(websocket.receive())
+    getter = None
+    try:
+        await websocket.send_json({'type': 'snapshot', 'alerts': alert_engine.alerts()})
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver.done():
+                if receiver.result()['type'] == 'websocket.disconnect':
+                    break
+                receiver = asyncio.ensure_future(websocket.receive())
+            if getter.done():
+                await websocket.send_json(getter.result())
+            else:
+                getter.cancel()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        if getter is not None:
+            getter.cancel()
+        alert_engine.unsubscribe(queue)
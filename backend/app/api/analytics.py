@@ -0,0 +1,43 @@
+from datetime import datetime
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.database import get_db
+from app.services.movements import MovementLog
+
+router = APIRouter(prefix="/analytics")
+
+SCOPE = Query("category", regex="^(sku|category|zone)$")
+BUCKET = Query("day", regex="^(hour|day)$")
+
+@router.get("/")
+def get_movement_series(
+    scope: str = SCOPE,
+    bucket: str = BUCKET,
+    key: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    # Received/picked/adjusted units, stock-outs and event counts per bucket
+    return MovementLog.series(db, scope, bucket, key=key, since=since, until=until)
+
+@router.get("/levels")
+def get_stock_levels(
+    key: str,
+    scope: str = SCOPE,
+    bucket: str = BUCKET,
+    since: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    return MovementLog.levels(db, scope, key, bucket, since=since)
+
+@router.get("/totals")
+def get_movement_totals(
+    scope: str = SCOPE,
+    bucket: str = BUCKET,
+    since: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    # Counters per key over the period, e.g. stock-outs by category
+    return MovementLog.totals_by_key(db, scope, bucket, since=since)
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.database import get_db
+from app.models.item import ProductInventory
+from app.services.forecasting import demand_forecaster
+
+router = APIRouter(prefix="/forecast")
+
+@router.get("/")
+def get_forecasts(
+    below_reorder: bool = Query(False, description="Only SKUs at or below their reorder point"),
+    limit: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db)
+):
+    # Forecasts with current stock and days of cover; the replenishment list
+    # comes most urgent first
+    demand_forecaster.ensure_loaded(db)
+    quantities = dict(db.query(ProductInventory.ProductID, ProductInventory.Quantity))
+    forecasts = []
+    for forecast in demand_forecaster.forecasts():
+        quantity = quantities.get(forecast['ProductID'])
+        if quantity is None:
+            continue
+        if below_reorder and quantity > forecast['reorder_point']:
+            continue
+        daily = forecast['daily_forecast']
+        forecasts.append({
+            **forecast,
+            'Quantity': quantity,
+            'days_of_cover': round(quantity / daily, 1) if daily > 0 else None,
+        })
+    if below_reorder:
+        forecasts.sort(key=lambda f: (f['days_of_cover'] is None, f['days_of_cover'] or 0, f['ProductID']))
+    return forecasts[:limit] if limit is not None else forecasts
+
+@router.get("/{product_id}")
+def get_forecast(product_id: str, horizon: int = Query(14, ge=1, le=365), db: Session = Depends(get_db)):
+    demand_forecaster.ensure_loaded(db)
+    forecast = demand_forecaster.forecast(product_id, horizon)
+    if forecast is None:
+        raise HTTPException(status_code=404, detail=f"No demand history for {product_id}")
+    return forecast
+
+@router.post("/refresh")
+def refresh_forecasts(full: bool = False, db: Session = Depends(get_db)):
+    # Folds the days completed since the last update; full rebuilds from history
+    demand_forecaster.ensure_loaded(db)
+    return demand_forecaster.update(db, full=full)
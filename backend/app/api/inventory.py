@@ -1,53 +1,245 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
-from app.models.item import ProductInventory
-from app.schemas.inventory import RackCapacityBase, InventoryBase, InventoryCreate, InventoryUpdate
+from typing import List, Optional
+from app.models.item import ProductInventory, RackPlacement
+from app.schemas.inventory import (
+    RackCapacityBase, RackContents, RackPlacementBase, InventoryBase, InventoryCreate, InventoryUpdate,
+    PickRequest, PickResult
+)
 from ..database import get_db
 from app.services.arrangement import WarehouseArranger
-from sqlalchemy import text
+from app.services.scheduler import scheduler
+from app.services.slotting import FIRST_FIT, STRATEGIES, SlottingOptimizer
+from app.services.ingest import BulkIngestor, iter_records
+from app.services.cache import response_cache
+from app.services.serialization import fast_response
+from app.services.alerts import alert_engine
+from app.services.forecasting import demand_forecaster
+from app.services.picking import Picker
+from app.services.movements import MovementLog
+from app.config import ARRANGEMENT_WAIT_TIMEOUT_SECONDS
+from sqlalchemy import Float, and_, or_, select, text
 from fastapi import Response
+import base64
+import json
 
 router = APIRouter(prefix="/inventory")
 
+def schedule_item_write(db_item: ProductInventory, response: Response, previous_demand: Optional[int] = None) -> int:
+    # Invalidate cached reads, re-check the row's alert and rearrange its zone
+    # in the background
+    response_cache.bump()
+    alert_engine.evaluate([db_item])
+    if previous_demand is None:
+        previous_demand = db_item.DemandPastMonth
+    zone = WarehouseArranger.get_zone(db_item.Category)
+    generation = scheduler.mark_dirty(zone, db_item.ProductID, previous_demand)
+    response.headers["X-Arrangement-Generation"] = str(generation)
+    return generation
+
+def after_item_write(db: Session, db_item: ProductInventory, response: Response, wait: bool,
+                     previous_demand: Optional[int] = None):
+    # Optionally wait for the rearrangement
+    generation = schedule_item_write(db_item, response, previous_demand)
+    if wait:
+        if not scheduler.wait_for(generation, ARRANGEMENT_WAIT_TIMEOUT_SECONDS):
+            raise HTTPException(status_code=504, detail=scheduler.timeout_detail(generation))
+        db.refresh(db_item)
+
 @router.post("/optimize")
-def optimize_storage(db: Session = Depends(get_db)):
-    WarehouseArranger.rearrange_inventory(db)
-    return {"message": "Storage optimized"}
+def optimize_storage(
+    strategy: str = Query(FIRST_FIT, regex=f"^({'|'.join(STRATEGIES)})$"),
+    apply: bool = Query(True, description="False only reports the cost the strategy would reach"),
+    db: Session = Depends(get_db)
+):
+    return optimize(db, strategy, apply)
+
+def optimize(db: Session, strategy: str, apply: bool) -> dict:
+    # Later zone rearrangements keep using the strategy that was applied
+    if not apply:
+        return {
+            "strategy": strategy,
+            "current": SlottingOptimizer.evaluate_current(db),
+            "planned": SlottingOptimizer.evaluate_plan(db, strategy),
+        }
+    report = scheduler.rearrange_all(db, strategy)
+    return {"message": "Storage optimized", "strategy": strategy, **report}
+
+@router.get("/arrangement-status")
+def arrangement_status(generation: Optional[int] = None, timeout: float = ARRANGEMENT_WAIT_TIMEOUT_SECONDS):
+    # Pass generation to block until that rearrangement has completed
+    if generation is not None:
+        scheduler.wait_for(generation, min(timeout, ARRANGEMENT_WAIT_TIMEOUT_SECONDS))
+    return scheduler.status()
+
+INVENTORY_FIELDS = list(InventoryBase.__fields__)
+# SQLite hands back whole numbers stored in FLOAT columns as ints
+INVENTORY_FLOAT_FIELDS = [f for f in INVENTORY_FIELDS if isinstance(getattr(ProductInventory, f).type, Float)]
+INVENTORY_SORT_KEYS = ["ProductID", "ProductName", "Category", "Quantity", "DemandPastMonth", "Price",
+                       "Zone", "IndividualWeight_kg", "TotalWeight_kg"]
+
+def encode_cursor(sort_value, product_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort_value, product_id]).encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        sort_value, product_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return sort_value, product_id
 
 @router.get("/", response_model=List[InventoryBase])
-def get_inventory(db: Session = Depends(get_db)):
-    items = db.query(ProductInventory).all()
-    return [InventoryBase.from_orm(item) for item in items]
+def get_inventory(
+    request: Request,
+    category: Optional[str] = None,
+    zone: Optional[str] = None,
+    low_stock: Optional[int] = Query(None, description="Only items with Quantity below this"),
+    sort: str = "ProductID",
+    order: str = Query("asc", regex="^(asc|desc)$"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    db: Session = Depends(get_db)
+):
+    # Served from the response cache until the next write or rearrangement
+    key = ("inventory", category, zone, low_stock, sort, order, limit, cursor, fields)
+    return response_cache.respond(request, key, lambda: query_inventory(
+        db, category, zone, low_stock, sort, order, limit, cursor, fields
+    ))
+
+def query_inventory(db: Session, category, zone, low_stock, sort, order, limit, cursor, fields):
+    statement, selected = inventory_statement(category, zone, low_stock, sort, order, limit, cursor, fields)
+    return inventory_page(db.execute(statement).all(), sort, limit, selected)
+
+def inventory_statement(category, zone, low_stock, sort, order, limit, cursor, fields):
+    """
+    Column-only SELECT for GET /inventory/ and the fields it returns.
+
+    Rows come back as tuples, never as ORM objects or models: they are
+    already valid, so reads skip validation entirely.
+    """
+    if sort not in INVENTORY_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(INVENTORY_SORT_KEYS)}")
+    sort_column = getattr(ProductInventory, sort)
+    if fields:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in selected if f not in INVENTORY_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    else:
+        selected = INVENTORY_FIELDS
+    # The cursor is built from the sort key and ProductID, so always fetch
+    # them. Table columns keep the ORM's per-row loading out of the read.
+    columns = list(dict.fromkeys(selected + [sort, "ProductID"]))
+    query = select(*[ProductInventory.__table__.c[c] for c in columns])
+
+    if category is not None:
+        query = query.where(ProductInventory.Category == category)
+    if zone is not None:
+        query = query.where(ProductInventory.Zone == zone)
+    if low_stock is not None:
+        query = query.where(ProductInventory.Quantity < low_stock)
+    if cursor is not None:
+        sort_value, product_id = decode_cursor(cursor)
+        if order == "asc":
+            after = or_(sort_column > sort_value, and_(sort_column == sort_value, ProductInventory.ProductID > product_id))
+        else:
+            after = or_(sort_column < sort_value, and_(sort_column == sort_value, ProductInventory.ProductID < product_id))
+        query = query.where(after)
+    if order == "asc":
+        query = query.order_by(sort_column.asc(), ProductInventory.ProductID.asc())
+    else:
+        query = query.order_by(sort_column.desc(), ProductInventory.ProductID.desc())
+    if limit is not None:
+        # One extra row tells us whether there is a next page
+        query = query.limit(limit + 1)
+    return query, selected
+
+def inventory_page(rows, sort, limit, selected):
+    """Response data and headers of GET /inventory/ from the statement's rows."""
+    headers = {}
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(getattr(rows[-1], sort), rows[-1].ProductID)
+    # The selected fields lead each row, so zip drops the cursor-only columns
+    data = [dict(zip(selected, row)) for row in rows]
+    for field in INVENTORY_FLOAT_FIELDS:
+        if field in selected:
+            for item in data:
+                if item[field] is not None:
+                    item[field] = float(item[field])
+    return data, headers
 
 @router.post("/", response_model=InventoryBase, status_code=201)
-def create_item(item: InventoryCreate, db: Session = Depends(get_db)):
+def create_item(item: InventoryCreate, response: Response, wait: bool = False, db: Session = Depends(get_db)):
     existing_item = db.query(ProductInventory).filter(
         ProductInventory.ProductName == item.ProductName,
         ProductInventory.Category == item.Category
     ).first()
     if existing_item:
-        existing_item.Quantity += item.Quantity
-        existing_item.TotalWeight_kg = existing_item.Quantity * existing_item.IndividualWeight_kg
+        MovementLog.record(db, [receive_into(existing_item, item)])
         db.commit()
         db.refresh(existing_item)
-        # Rearrange inventory to distribute new quantity into racks
-        WarehouseArranger.rearrange_inventory(db)
-        db.refresh(existing_item)
+        # Rearrange the product's zone to distribute new quantity into racks
+        after_item_write(db, existing_item, response, wait)
         return InventoryBase.from_orm(existing_item)
     else:
         db_item = ProductInventory(**item.dict())
         db.add(db_item)
+        MovementLog.record(db, [{
+            'ProductID': item.ProductID, 'Category': item.Category, 'kind': 'create',
+            'quantity_delta': item.Quantity, 'quantity_after': item.Quantity,
+        }])
         db.commit()
         db.refresh(db_item)
-        WarehouseArranger.rearrange_inventory(db)
-        db.refresh(db_item)
+        after_item_write(db, db_item, response, wait)
         return InventoryBase.from_orm(db_item)
 
+def receive_into(existing_item: ProductInventory, item: InventoryCreate) -> dict:
+    # A create for an existing name and category adds to its stock
+    existing_item.Quantity += item.Quantity
+    existing_item.TotalWeight_kg = existing_item.Quantity * existing_item.IndividualWeight_kg
+    return {
+        'ProductID': existing_item.ProductID, 'Category': existing_item.Category, 'kind': 'receive',
+        'quantity_delta': item.Quantity, 'quantity_after': existing_item.Quantity,
+    }
+
+def apply_update(db_item: ProductInventory, item: InventoryUpdate) -> dict:
+    previous_quantity = db_item.Quantity
+    update_data = item.dict(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(db_item, field, value)
+
+    if 'Quantity' in update_data or 'IndividualWeight_kg' in update_data:
+        db_item.TotalWeight_kg = db_item.Quantity * db_item.IndividualWeight_kg
+    return {
+        'ProductID': db_item.ProductID, 'Category': db_item.Category, 'kind': 'adjust',
+        'quantity_delta': db_item.Quantity - previous_quantity, 'quantity_after': db_item.Quantity,
+    }
+
+@router.post("/bulk")
+async def bulk_ingest(request: Request, format: Optional[str] = None, db: Session = Depends(get_db)):
+    # Stream a CSV (with header row) or NDJSON manifest; rearrange once at the end
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'ndjson'")
+    ingestor = BulkIngestor(db)
+    async for row, record in iter_records(request.stream(), format):
+        if ingestor.add(row, record):
+            await run_in_threadpool(ingestor.flush)
+    await run_in_threadpool(ingestor.flush)
+    if ingestor.inserted or ingestor.updated:
+        await run_in_threadpool(scheduler.rearrange_all, db)
+    return ingestor.summary()
+
 @router.patch("/{product_id}", response_model=InventoryBase)
 def update_item(
     product_id: str,
     item: InventoryUpdate,
+    response: Response,
+    wait: bool = False,
     db: Session = Depends(get_db)
 ):
     db_item = db.query(ProductInventory).filter(
@@ -60,71 +252,162 @@ def update_item(
             detail=f"Product {product_id} not found"
         )
     
-    update_data = item.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_item, field, value)
-    
-    if 'Quantity' in update_data or 'IndividualWeight_kg' in update_data:
-        db_item.TotalWeight_kg = db_item.Quantity * db_item.IndividualWeight_kg
+    MovementLog.record(db, [apply_update(db_item, item)])
     db.commit()
     db.refresh(db_item)
-    # Rearrange inventory to update rack allocation
-    WarehouseArranger.rearrange_inventory(db)
-    db.refresh(db_item)
+    # Rearrange the product's zone to update rack allocation
+    after_item_write(db, db_item, response, wait)
     return InventoryBase.from_orm(db_item)
 
+def after_pick(token: tuple, changed) -> int:
+    # Picks free their own racks in place, so the zone is normally not
+    # rearranged now: its next rearrangement starts no later than the picked
+    # products. Returns the generation the picks' placement is final at.
+    if not changed:
+        return scheduler.completed_generation
+    response_cache.bump()
+    alert_engine.evaluate([row for row, _ in changed])
+    # A pick may be the first of a new day: fold the completed one
+    demand_forecaster.refresh_if_due()
+    return max(
+        scheduler.after_pick(token, WarehouseArranger.get_zone(row.Category), row.ProductID, previous_demand)
+        for row, previous_demand in changed
+    )
+
+@router.post("/pick", response_model=List[PickResult])
+def pick_items(pick: PickRequest, response: Response, db: Session = Depends(get_db)):
+    token = scheduler.pick_token()
+    results, changed = Picker.pick(db, [line.dict() for line in pick.lines])
+    response.headers["X-Arrangement-Generation"] = str(after_pick(token, changed))
+    return results
+
 @router.patch("/retrieve/{product_id}", response_model=InventoryBase)
-def retrieve_item(product_id: str, quantity: int, db: Session = Depends(get_db)):
-    db_item = db.query(ProductInventory).filter(ProductInventory.ProductID == product_id).first()
-    if not db_item:
+def retrieve_item(product_id: str, quantity: int, response: Response, wait: bool = False,
+                  db: Session = Depends(get_db)):
+    if quantity <= 0:
+        raise HTTPException(status_code=400, detail="Quantity must be positive")
+    token = scheduler.pick_token()
+    results, changed = Picker.pick(db, [{'ProductID': product_id, 'quantity': quantity}])
+    generation = after_pick(token, changed)
+    if results[0]['Quantity'] is None:
         raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
-    if db_item.Quantity < quantity:
+    if not results[0]['picked']:
         raise HTTPException(status_code=400, detail="Not enough quantity in stock")
-    db_item.Quantity -= quantity
-    db_item.DemandPastMonth += quantity
-    db_item.TotalWeight_kg = db_item.Quantity * db_item.IndividualWeight_kg
-    db.commit()
-    db.refresh(db_item)
-    # Rearrange inventory to remove from last racks first
-    WarehouseArranger.rearrange_inventory(db)
-    db.refresh(db_item)
+    response.headers["X-Arrangement-Generation"] = str(generation)
+    if wait and not scheduler.wait_for(generation, ARRANGEMENT_WAIT_TIMEOUT_SECONDS):
+        raise HTTPException(status_code=504, detail=scheduler.timeout_detail(generation))
+    db_item = db.query(ProductInventory).filter(ProductInventory.ProductID == product_id).first()
     return InventoryBase.from_orm(db_item)
 
 @router.get("/rack-capacity", response_model=List[RackCapacityBase])
-def get_rack_capacity(db: Session = Depends(get_db)):
+def get_rack_capacity(request: Request, db: Session = Depends(get_db)):
+    return response_cache.respond(request, ("rack-capacity",), lambda: (query_rack_capacity(db), None))
+
+RACK_CAPACITY_QUERY = text("SELECT id, zone, shelf, rack, used_weight FROM rack_capacity")
+
+def query_rack_capacity(db: Session):
     # Get all existing racks from the table
-    result = db.execute(text("SELECT id, zone, shelf, rack, used_weight FROM rack_capacity")).fetchall()
+    return rack_capacity_rows(db.execute(RACK_CAPACITY_QUERY).fetchall())
+
+def rack_capacity_rows(result) -> List[dict]:
+    """Every rack of the layout, with the stored id and used weight where there is a row."""
     existing = {(row[1], row[2], row[3]): (row[0], row[4]) for row in result}
 
-    # All possible zones (from ZONE_MAPPING)
-    all_zones = ['A', 'B', 'C', 'D', 'F', 'G', 'H', 'I', 'J', 'Z']
-    all_shelves = range(1, 21)
-    all_racks = range(1, 11)
+    # Every rack of the layout, zone by zone, as plain dicts in
+    # RackCapacityBase's shape: a model per rack was most of the cost
+    layout = WarehouseArranger.layout
     racks = []
     next_id = max([row[0] for row in result], default=0) + 1
-    for zone in all_zones:
-        for shelf in all_shelves:
-            for rack in all_racks:
+    for zone in layout.zone_codes:
+        zone_layout = layout.zones[zone]
+        for shelf in range(1, zone_layout.shelves + 1):
+            for rack in range(1, zone_layout.racks_per_shelf + 1):
                 key = (zone, shelf, rack)
                 if key in existing:
-                    racks.append(RackCapacityBase(
-                        id=existing[key][0],
-                        zone=zone,
-                        shelf=shelf,
-                        rack=rack,
-                        used_weight=existing[key][1]
-                    ))
+                    rack_id, used_weight = existing[key]
+                    used_weight = float(used_weight or 0.0)
                 else:
-                    racks.append(RackCapacityBase(
-                        id=next_id,
-                        zone=zone,
-                        shelf=shelf,
-                        rack=rack,
-                        used_weight=0.0
-                    ))
+                    rack_id, used_weight = next_id, 0.0
                     next_id += 1
+                racks.append({'id': rack_id, 'zone': zone, 'shelf': shelf, 'rack': rack, 'used_weight': used_weight})
     return racks
 
+@router.get("/racks/{zone}/{shelf}/{rack}", response_model=RackContents)
+def get_rack_contents(zone: str, shelf: int, rack: int, db: Session = Depends(get_db)):
+    zone_layout = rack_layout(zone, shelf, rack)
+    items = db.execute(rack_contents_statement(zone, shelf, rack)).scalars().all()
+    return rack_contents(zone_layout, shelf, rack, items)
+
+def rack_layout(zone: str, shelf: int, rack: int):
+    zone_layout = WarehouseArranger.layout.zones.get(zone)
+    if zone_layout is None or not zone_layout.has_rack(shelf, rack):
+        raise HTTPException(status_code=404, detail=f"Rack {zone}{shelf}-{rack} does not exist")
+    return zone_layout
+
+def rack_contents_statement(zone: str, shelf: int, rack: int):
+    return select(RackPlacement).where(
+        RackPlacement.zone == zone, RackPlacement.shelf == shelf, RackPlacement.rack == rack
+    )
+
+def rack_contents(zone_layout, shelf: int, rack: int, items) -> RackContents:
+    zone = zone_layout.code
+    used_weight = sum(item.weight for item in items)
+    return RackContents(
+        zone=zone,
+        shelf=shelf,
+        rack=rack,
+        used_weight=used_weight,
+        free_weight=max(zone_layout.capacity(shelf, rack) - used_weight, 0.0),
+        items=[RackPlacementBase.from_orm(item) for item in items],
+    )
+
+@router.get("/locations/{product_id}", response_model=List[RackPlacementBase])
+def get_product_locations(product_id: str, db: Session = Depends(get_db)):
+    if db.execute(product_exists_statement(product_id)).first() is None:
+        raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+    placements = db.execute(locations_statement(product_id)).scalars().all()
+    return [RackPlacementBase.from_orm(p) for p in placements]
+
+def product_exists_statement(product_id: str):
+    return select(ProductInventory.ProductID).where(ProductInventory.ProductID == product_id)
+
+def locations_statement(product_id: str):
+    return select(RackPlacement).where(RackPlacement.ProductID == product_id).order_by(
+        RackPlacement.zone, RackPlacement.shelf, RackPlacement.rack
+    )
+
+@router.get("/free-capacity")
+def get_free_capacity(request: Request, zone: Optional[str] = None, db: Session = Depends(get_db)):
+    statement, params = free_capacity_query(zone)
+    return fast_response(request, free_capacity(zone, db.execute(statement, params)))
+
+def free_capacity_query(zone: Optional[str]):
+    query = "SELECT zone, shelf, rack, used_weight FROM rack_capacity"
+    params = {}
+    if zone is not None:
+        query += " WHERE zone = :zone"
+        params['zone'] = zone
+    return text(query), params
+
+def free_capacity(zone: Optional[str], rows) -> dict:
+    # {zone: [[free weight of each rack] for each shelf]}
+    layout = WarehouseArranger.layout
+    zones = [zone] if zone is not None else layout.zone_codes
+    if any(z not in layout.zones for z in zones):
+        raise HTTPException(status_code=404, detail=f"Zone {zone} does not exist")
+    free = {
+        z: [
+            [layout.zones[z].capacity(shelf, rack) for rack in range(1, layout.zones[z].racks_per_shelf + 1)]
+            for shelf in range(1, layout.zones[z].shelves + 1)
+        ]
+        for z in zones
+    }
+    for row_zone, shelf, rack, used_weight in rows:
+        if row_zone in free and layout.zones[row_zone].has_rack(shelf, rack):
+            capacity = layout.zones[row_zone].capacity(shelf, rack)
+            free[row_zone][shelf - 1][rack - 1] = max(capacity - (used_weight or 0.0), 0.0)
+    return free
+
 @router.get("/debug/rack-contents")
 def debug_rack_contents(db: Session = Depends(get_db)):
     result = db.execute(text("SELECT * FROM rack_capacity LIMIT 20")).fetchall()
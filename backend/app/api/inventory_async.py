@@ -0,0 +1,169 @@
+"""
+Async variants of the inventory endpoints, mounted ahead of the sync ones
+when API_MODE=async.
+
+Reads and single-item writes run on the event loop over an async driver, so
+they never hold a threadpool worker. Rearrangement stays off the loop:
+zones are re-placed by the background scheduler (placement itself on the
+process pool), writes that ask to wait suspend instead of blocking a
+thread, and full rearrangements run one at a time on their own executor.
+Everything else (bulk ingest, picks, debug) is served by the sync router.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+
+from app.api.inventory import (
+    RACK_CAPACITY_QUERY, apply_update, free_capacity, free_capacity_query, inventory_page, inventory_statement,
+    locations_statement, optimize, product_exists_statement, rack_capacity_rows, rack_contents,
+    rack_contents_statement, rack_layout, receive_into, schedule_item_write
+)
+from app.config import ARRANGEMENT_WAIT_TIMEOUT_SECONDS
+from app.database import SessionLocal, get_async_db
+from app.models.item import ProductInventory
+from app.schemas.inventory import (
+    InventoryBase, InventoryCreate, InventoryUpdate, RackCapacityBase, RackContents, RackPlacementBase
+)
+from app.services.cache import response_cache
+from app.services.movements import MovementLog
+from app.services.scheduler import scheduler
+from app.services.serialization import fast_response
+from app.services.slotting import FIRST_FIT, STRATEGIES
+
+router = APIRouter(prefix="/inventory")
+
+# Full rearrangements queue here, one at a time, instead of in the request threadpool
+arrangement_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="arrangement")
+
+async def run_in_arrangement_executor(func, *args):
+    # Copy the context so the request's metrics see the statements
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        arrangement_executor, functools.partial(context.run, func, *args)
+    )
+
+def _optimize(strategy: str, apply: bool) -> dict:
+    db = SessionLocal()
+    try:
+        return optimize(db, strategy, apply)
+    finally:
+        db.close()
+
+async def after_item_write(db, db_item: ProductInventory, response: Response, wait: bool,
+                           previous_demand: Optional[int] = None):
+    generation = schedule_item_write(db_item, response, previous_demand)
+    if wait:
+        if not await scheduler.wait_for_async(generation, ARRANGEMENT_WAIT_TIMEOUT_SECONDS):
+            raise HTTPException(status_code=504, detail=scheduler.timeout_detail(generation))
+        await db.refresh(db_item)
+
+@router.post("/optimize")
+async def optimize_storage(
+    strategy: str = Query(FIRST_FIT, regex=f"^({'|'.join(STRATEGIES)})$"),
+    apply: bool = Query(True, description="False only reports the cost the strategy would reach"),
+):
+    return await run_in_arrangement_executor(_optimize, strategy, apply)
+
+@router.get("/arrangement-status")
+async def arrangement_status(generation: Optional[int] = None, timeout: float = ARRANGEMENT_WAIT_TIMEOUT_SECONDS):
+    # Pass generation to wait until that rearrangement has completed
+    if generation is not None:
+        await scheduler.wait_for_async(generation, min(timeout, ARRANGEMENT_WAIT_TIMEOUT_SECONDS))
+    return scheduler.status()
+
+@router.get("/", response_model=List[InventoryBase])
+async def get_inventory(
+    request: Request,
+    category: Optional[str] = None,
+    zone: Optional[str] = None,
+    low_stock: Optional[int] = Query(None, description="Only items with Quantity below this"),
+    sort: str = "ProductID",
+    order: str = Query("asc", regex="^(asc|desc)$"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    db=Depends(get_async_db)
+):
+    async def build():
+        statement, selected = inventory_statement(category, zone, low_stock, sort, order, limit, cursor, fields)
+        return inventory_page((await db.execute(statement)).all(), sort, limit, selected)
+
+    # Same cache (and key) as the sync endpoint
+    key = ("inventory", category, zone, low_stock, sort, order, limit, cursor, fields)
+    return await response_cache.respond_async(request, key, build)
+
+@router.post("/", response_model=InventoryBase, status_code=201)
+async def create_item(item: InventoryCreate, response: Response, wait: bool = False, db=Depends(get_async_db)):
+    existing_item = (await db.execute(select(ProductInventory).where(
+        ProductInventory.ProductName == item.ProductName,
+        ProductInventory.Category == item.Category
+    ))).scalars().first()
+    if existing_item:
+        db_item = existing_item
+        movement = receive_into(existing_item, item)
+    else:
+        db_item = ProductInventory(**item.dict())
+        db.add(db_item)
+        movement = {
+            'ProductID': item.ProductID, 'Category': item.Category, 'kind': 'create',
+            'quantity_delta': item.Quantity, 'quantity_after': item.Quantity,
+        }
+    statement = MovementLog.insert_statement([movement])
+    if statement is not None:
+        await db.execute(statement)
+    await db.commit()
+    await after_item_write(db, db_item, response, wait)
+    return InventoryBase.from_orm(db_item)
+
+@router.patch("/{product_id}", response_model=InventoryBase)
+async def update_item(
+    product_id: str,
+    item: InventoryUpdate,
+    response: Response,
+    wait: bool = False,
+    db=Depends(get_async_db)
+):
+    db_item = (await db.execute(
+        select(ProductInventory).where(ProductInventory.ProductID == product_id)
+    )).scalars().first()
+    if not db_item:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Product {product_id} not found"
+        )
+    statement = MovementLog.insert_statement([apply_update(db_item, item)])
+    if statement is not None:
+        await db.execute(statement)
+    await db.commit()
+    await after_item_write(db, db_item, response, wait)
+    return InventoryBase.from_orm(db_item)
+
+@router.get("/rack-capacity", response_model=List[RackCapacityBase])
+async def get_rack_capacity(request: Request, db=Depends(get_async_db)):
+    async def build():
+        return rack_capacity_rows((await db.execute(RACK_CAPACITY_QUERY)).fetchall()), None
+
+    return await response_cache.respond_async(request, ("rack-capacity",), build)
+
+@router.get("/racks/{zone}/{shelf}/{rack}", response_model=RackContents)
+async def get_rack_contents(zone: str, shelf: int, rack: int, db=Depends(get_async_db)):
+    zone_layout = rack_layout(zone, shelf, rack)
+    items = (await db.execute(rack_contents_statement(zone, shelf, rack))).scalars().all()
+    return rack_contents(zone_layout, shelf, rack, items)
+
+@router.get("/locations/{product_id}", response_model=List[RackPlacementBase])
+async def get_product_locations(product_id: str, db=Depends(get_async_db)):
+    if (await db.execute(product_exists_statement(product_id))).first() is None:
+        raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+    placements = (await db.execute(locations_statement(product_id))).scalars().all()
+    return [RackPlacementBase.from_orm(p) for p in placements]
+
+@router.get("/free-capacity")
+async def get_free_capacity(request: Request, zone: Optional[str] = None, db=Depends(get_async_db)):
+    statement, params = free_capacity_query(zone)
+    return fast_response(request, free_capacity(zone, (await db.execute(statement, params)).fetchall()))
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+from app.services.metrics import metrics
+from app.services.profiler import profiler
+
+router = APIRouter()
+# Only mounted with DEBUG_ENDPOINTS
+debug_router = APIRouter(prefix="/debug")
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@debug_router.get("/profiles")
+def get_profiles():
+    # Most recent slow-request profiles first
+    return {
+        'threshold_ms': profiler.threshold_ms,
+        'interval_ms': profiler.interval_ms,
+        'profiles': profiler.recent(),
+    }
+
+@debug_router.put("/profiler")
+def configure_profiler(
+    threshold_ms: float = Query(..., ge=0, description="Profile requests slower than this; 0 turns profiling off"),
+    interval_ms: Optional[float] = Query(None, gt=0, le=1000),
+):
+    profiler.configure(threshold_ms, interval_ms)
+    return {'threshold_ms': profiler.threshold_ms, 'interval_ms': profiler.interval_ms}
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.schemas.picklists import PickListRequest, PickListResponse
+from app.services.picklists import PickListPlanner
+
+router = APIRouter(prefix="/picklists")
+
+@router.post("/", response_model=PickListResponse)
+def create_pick_lists(request: PickListRequest, db: Session = Depends(get_db)):
+    # Plans routes only; stock is booked when the picks are posted to /inventory/pick
+    order_ids = [order.order_id for order in request.orders]
+    if len(set(order_ids)) != len(order_ids):
+        raise HTTPException(status_code=400, detail="Duplicate order_id")
+    return PickListPlanner.plan(db, [order.dict() for order in request.orders], request.wave_size)
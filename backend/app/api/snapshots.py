@@ -0,0 +1,120 @@
+import os
+from contextlib import contextmanager
+from tempfile import SpooledTemporaryFile
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, get_db
+from app.services.scheduler import scheduler
+from app.services.serialization import accepts_gzip
+from app.services.snapshots import (
+    TABLES, SnapshotError, SnapshotReader, WarehouseSnapshot, gzip_stream, open_snapshot
+)
+
+router = APIRouter(prefix="/snapshots")
+
+NDJSON = "application/x-ndjson"
+# Uploads larger than this are spooled to disk before they are restored
+SPOOL_MAX_BYTES = 16 * 1024 * 1024
+READ_BYTES = 64 * 1024
+
+@contextmanager
+def snapshot_errors():
+    try:
+        yield
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except FileExistsError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+def live_lines():
+    # Its own session: the response streams after the request's has closed
+    db = SessionLocal()
+    try:
+        yield from WarehouseSnapshot.export(db, strategy=scheduler.strategy)
+    finally:
+        db.close()
+
+def file_chunks(path: str):
+    with open(path, "rb") as f:
+        yield from iter(lambda: f.read(READ_BYTES), b"")
+
+@router.get("/")
+def list_snapshots():
+    with snapshot_errors():
+        return [WarehouseSnapshot.describe(name) for name in reversed(WarehouseSnapshot.names())]
+
+@router.post("/", status_code=201)
+def save_snapshot(name: Optional[str] = None, db: Session = Depends(get_db)):
+    with snapshot_errors():
+        return WarehouseSnapshot.save(db, name, strategy=scheduler.strategy)
+
+@router.get("/export")
+def export_snapshot(request: Request):
+    # Streams the current state without storing it; gzipped for clients that accept it
+    if accepts_gzip(request):
+        return StreamingResponse(gzip_stream(live_lines()), media_type=NDJSON,
+                                 headers={"Content-Encoding": "gzip"})
+    return StreamingResponse(live_lines(), media_type=NDJSON)
+
+@router.post("/import")
+async def import_snapshot(request: Request, db: Session = Depends(get_db)):
+    # Plain or gzipped NDJSON body, as written by /export; restored only once fully received.
+    # The spool may roll over to disk, so it is written off the event loop.
+    with SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as upload:
+        async for chunk in request.stream():
+            await run_in_threadpool(upload.write, chunk)
+        upload.seek(0)
+        with snapshot_errors():
+            return await run_in_threadpool(scheduler.restore, db, open_snapshot(upload))
+
+@router.get("/diff")
+def diff_snapshots(
+    from_: str = Query(..., alias="from", description="Older stored snapshot"),
+    to: Optional[str] = Query(None, description="Newer stored snapshot; the current state if omitted"),
+    table: Optional[List[str]] = Query(None, description=f"Only these of {', '.join(TABLES)}"),
+    limit: int = Query(1000, ge=0, le=100000, description="Changes to list; counts are always complete"),
+):
+    # E.g. which products moved rack between two rearrangements
+    with snapshot_errors():
+        if table and set(table) - set(TABLES):
+            raise SnapshotError(f"table must be one of {', '.join(TABLES)}")
+        with WarehouseSnapshot.open(from_) as old:
+            if to is not None:
+                with WarehouseSnapshot.open(to) as new:
+                    return WarehouseSnapshot.diff(SnapshotReader(old), SnapshotReader(new), table, limit)
+            lines = live_lines()
+            try:
+                return WarehouseSnapshot.diff(SnapshotReader(old), SnapshotReader(lines), table, limit)
+            finally:
+                lines.close()
+
+@router.get("/{name}")
+def download_snapshot(name: str, request: Request):
+    with snapshot_errors():
+        path = WarehouseSnapshot.path(name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Snapshot {name} not found")
+        if accepts_gzip(request):
+            # Stored gzipped: sent as is
+            return StreamingResponse(file_chunks(path), media_type=NDJSON, headers={"Content-Encoding": "gzip"})
+        return StreamingResponse(WarehouseSnapshot.open(name), media_type=NDJSON)
+
+@router.post("/{name}/restore")
+def restore_snapshot(name: str, db: Session = Depends(get_db)):
+    # E.g. roll back a bad rearrangement from its SNAPSHOT_BEFORE_REARRANGE snapshot
+    with snapshot_errors():
+        with WarehouseSnapshot.open(name) as f:
+            return scheduler.restore(db, f)
+
+@router.delete("/{name}", status_code=204)
+def delete_snapshot(name: str):
+    with snapshot_errors():
+        WarehouseSnapshot.delete(name)
+    return Response(status_code=204)
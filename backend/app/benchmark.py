@@ -0,0 +1,240 @@
+"""
+Benchmark the arranger and the inventory API on synthetic catalogs.
+
+    python -m app.benchmark --sizes 1000 10000 --output bench.json
+    python -m app.benchmark --sizes 1000 10000 --baseline bench.json
+
+Each size gets a freshly generated catalog (seeded, so runs are comparable)
+in its own database: BENCHMARK_DATABASE_URL, a local SQLite file by default.
+The configured DATABASE_URL is never touched; the benchmark wipes its tables.
+
+Timed operations: a full rearrangement, single-item writes that wait for
+their zone to be rearranged, and GET /inventory/ and /inventory/rack-capacity
+(cold, after a cache bump, and cached) through an in-process client. Every
+operation also records the SQL statements it issued and their database time. With --baseline, each
+operation is compared with the saved run and the exit status is 1 if any
+got slower than --tolerance or issued more statements.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Must be set before app.config is imported: the app binds its engine at import
+BENCHMARK_DATABASE_URL = os.getenv("BENCHMARK_DATABASE_URL", "sqlite:///benchmark.db")
+os.environ["DATABASE_URL"] = BENCHMARK_DATABASE_URL
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from app import config
+from app.database import Base, SessionLocal, engine
+from app.main import app
+from app.models.item import (
+    DemandForecast, ForecastWatermark, InventoryMovement, InventoryRollup, ProductInventory, RackCapacity,
+    RackPlacement, RollupWatermark, StockThreshold
+)
+from app.services.arrangement import WarehouseArranger
+from app.services.cache import response_cache
+from app.services.metrics import metrics
+from app.services.scheduler import scheduler
+
+if config.DATABASE_URL != BENCHMARK_DATABASE_URL:
+    raise RuntimeError("app.config was imported before app.benchmark; run it with python -m app.benchmark")
+
+DEFAULT_SIZES = [1000, 10000]
+# Categories outside the layout's rules land in the default zone
+EXTRA_CATEGORIES = ["garden", "automotive", "pet supplies"]
+INSERT_BATCH_SIZE = 5000
+# Slowdowns smaller than this are timer noise, whatever the tolerance
+MIN_REGRESSION_MS = 1.0
+
+def generate_catalog(size: int, seed: int):
+    """
+    Yield `size` product rows.
+
+    Category popularity, demand and stock follow long-tailed (log-normal)
+    distributions, so a few SKUs move most of the volume; unit weights
+    range from sachets to crates.
+    """
+    rng = random.Random(seed)
+    categories = sorted(WarehouseArranger.layout.categories) + EXTRA_CATEGORIES
+    popularity = [rng.lognormvariate(0, 0.8) for _ in categories]
+    for i in range(size):
+        category = rng.choices(categories, popularity)[0].title()
+        quantity = max(int(rng.lognormvariate(4.0, 1.0)), 0)
+        weight = round(min(max(rng.lognormvariate(-0.5, 1.1), 0.05), 60.0), 3)
+        yield {
+            'ProductID': f"B{i:07d}",
+            'ProductName': f"{category} item {i}",
+            'Category': category,
+            'Quantity': quantity,
+            'DemandPastMonth': int(rng.lognormvariate(2.5, 1.3)),
+            'Price': round(rng.lognormvariate(3.0, 1.0), 2),
+            'Zone': WarehouseArranger.get_zone(category),
+            'ShelfLocation': "",
+            'RackLocation': "",
+            'IndividualWeight_kg': weight,
+            'TotalWeight_kg': quantity * weight,
+        }
+
+def load_catalog(size: int, seed: int):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        for model in (ProductInventory, RackCapacity, RackPlacement, StockThreshold,
+                      InventoryMovement, InventoryRollup, RollupWatermark, DemandForecast, ForecastWatermark):
+            db.execute(model.__table__.delete())
+        batch = []
+        for row in generate_catalog(size, seed):
+            batch.append(row)
+            if len(batch) == INSERT_BATCH_SIZE:
+                db.execute(insert(ProductInventory.__table__), batch)
+                batch = []
+        if batch:
+            db.execute(insert(ProductInventory.__table__), batch)
+        db.commit()
+    finally:
+        db.close()
+
+def summarize(samples: list, statements: float, db_seconds: float) -> dict:
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, math.ceil(p * len(ordered)) - 1)] * 1000
+
+    return {
+        'runs': len(samples),
+        'mean_ms': round(sum(samples) / len(samples) * 1000, 3),
+        'p50_ms': round(percentile(0.5), 3),
+        'p95_ms': round(percentile(0.95), 3),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'statements': round(statements / len(samples), 1),
+        'db_ms': round(db_seconds / len(samples) * 1000, 3),
+    }
+
+@contextmanager
+def measure(samples: list, totals: dict):
+    # Statements from every thread, including the arrangement scheduler
+    statements = metrics.db_statements_total.total()
+    db_seconds = metrics.db_seconds_total.total()
+    started = time.perf_counter()
+    yield
+    samples.append(time.perf_counter() - started)
+    totals['statements'] += metrics.db_statements_total.total() - statements
+    totals['db_seconds'] += metrics.db_seconds_total.total() - db_seconds
+
+def run_operation(repeat: int, operation) -> dict:
+    samples, totals = [], {'statements': 0, 'db_seconds': 0.0}
+    for i in range(repeat):
+        with measure(samples, totals):
+            operation(i)
+    return summarize(samples, totals['statements'], totals['db_seconds'])
+
+def benchmark_size(client: TestClient, size: int, seed: int, repeat: int, writes: int) -> dict:
+    load_catalog(size, seed)
+    results = {}
+
+    def rearrange(_):
+        db = SessionLocal()
+        try:
+            WarehouseArranger.rearrange_inventory(db)
+        finally:
+            db.close()
+
+    results['rearrange_inventory'] = run_operation(repeat, rearrange)
+
+    rng = random.Random(seed)
+    product_ids = [f"B{rng.randrange(size):07d}" for _ in range(writes)]
+
+    def write(i):
+        response = client.patch(
+            f"/api/inventory/{product_ids[i]}", params={'wait': 'true'}, json={'Quantity': rng.randint(0, 500)}
+        )
+        response.raise_for_status()
+
+    results['update_item_wait'] = run_operation(writes, write)
+
+    for name, path in (('get_inventory', "/api/inventory/"), ('get_rack_capacity', "/api/inventory/rack-capacity")):
+        def cold(_, path=path):
+            response_cache.bump()
+            client.get(path).raise_for_status()
+
+        def cached(_, path=path):
+            client.get(path).raise_for_status()
+
+        results[name] = run_operation(repeat, cold)
+        results[f"{name}_cached"] = run_operation(repeat, cached)
+    return results
+
+def run(sizes, seed: int, repeat: int, writes: int) -> dict:
+    # Rearrange right after each write instead of after the debounce window
+    scheduler.window = 0.0
+    with TestClient(app) as client:
+        results = {str(size): benchmark_size(client, size, seed, repeat, writes) for size in sizes}
+    return {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': engine.url.get_backend_name(),
+            'sqlite': sqlite3.sqlite_version,
+            'seed': seed,
+            'repeat': repeat,
+            'writes': writes,
+        },
+        'results': results,
+    }
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Operations slower than the baseline by more than `tolerance` or issuing more statements."""
+    regressions = []
+    for size, operations in current['results'].items():
+        for name, result in operations.items():
+            base = baseline.get('results', {}).get(size, {}).get(name)
+            if base is None:
+                continue
+            slower = result['p50_ms'] - base['p50_ms'] > max(base['p50_ms'] * tolerance, MIN_REGRESSION_MS)
+            chattier = result['statements'] > base['statements']
+            status = "REGRESSION" if slower or chattier else "ok"
+            print(f"{status:10} {size:>7} {name:28} p50 {base['p50_ms']:>10.2f} -> {result['p50_ms']:>10.2f} ms  "
+                  f"statements {base['statements']:>7} -> {result['statements']:>7}")
+            if status != "ok":
+                regressions.append({'size': size, 'operation': name, 'baseline': base, 'current': result})
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark rearrangement and the inventory API")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Catalog sizes (SKUs)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs of each rearrangement and read")
+    parser.add_argument("--writes", type=int, default=20, help="Single-item writes per size")
+    parser.add_argument("--output", help="Write the results as JSON to this file (default: stdout)")
+    parser.add_argument("--baseline", help="Saved results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed p50 slowdown against the baseline (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.seed, args.repeat, args.writes)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
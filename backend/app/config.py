@@ -0,0 +1,100 @@
+import os
+import urllib.parse
+
+# Storage backend: "mysql" (default) or "sqlite"; DATABASE_URL overrides both
+DATABASE_BACKEND = os.getenv("DATABASE_BACKEND", "mysql")
+DB_USER = os.getenv("DB_USER", "root")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "pranav1234")
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_PORT = os.getenv("DB_PORT", "3306")
+DB_NAME = os.getenv("DB_NAME", "warehouse")
+# Database file for the sqlite backend; ":memory:" for a throwaway database
+SQLITE_PATH = os.getenv("SQLITE_PATH", "warehouse.db")
+
+if os.getenv("DATABASE_URL"):
+    DATABASE_URL = os.environ["DATABASE_URL"]
+elif DATABASE_BACKEND == "sqlite":
+    DATABASE_URL = "sqlite://" if SQLITE_PATH == ":memory:" else f"sqlite:///{SQLITE_PATH}"
+else:
+    DATABASE_URL = (
+        f"mysql+pymysql://{DB_USER}:{urllib.parse.quote_plus(DB_PASSWORD)}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    )
+
+# "async" serves inventory reads and item writes from async endpoints on an
+# async driver (aiomysql / aiosqlite); "sync" keeps the threadpool endpoints
+API_MODE = os.getenv("API_MODE", "sync")
+
+def _async_url(url: str) -> str:
+    for sync_driver, async_driver in (("mysql+pymysql", "mysql+aiomysql"), ("sqlite", "sqlite+aiosqlite")):
+        if url.startswith(sync_driver + "://"):
+            return async_driver + url[len(sync_driver):]
+    return url
+
+# Same database through the async driver
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+
+# Connection pool (ignored by sqlite, which uses one connection per thread)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Seconds to wait for a free pooled connection (sqlite: for a database lock)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+
+
+# Seconds to wait after the first write to a zone before rearranging it, so
+# bursts of writes are coalesced into one rearrangement per zone
+ARRANGEMENT_DEBOUNCE_SECONDS = float(os.getenv("ARRANGEMENT_DEBOUNCE_SECONDS", "0.5"))
+# Longest a request may block when it asks to wait for its rearrangement
+ARRANGEMENT_WAIT_TIMEOUT_SECONDS = float(os.getenv("ARRANGEMENT_WAIT_TIMEOUT_SECONDS", "30"))
+# Rows validated and written per multi-row statement by POST /inventory/bulk
+BULK_INGEST_BATCH_SIZE = int(os.getenv("BULK_INGEST_BATCH_SIZE", "1000"))
+
+# JSON definition of zones, shelves, racks, rack weight limits and
+# category-to-zone rules (see data/layout.json)
+WAREHOUSE_LAYOUT_PATH = os.getenv(
+    "WAREHOUSE_LAYOUT_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "layout.json"),
+)
+# Worker processes a full rearrangement places zones on; 1 places them in-process
+# (in async mode placement always runs in worker processes, off the event loop)
+ARRANGEMENT_WORKERS = int(os.getenv("ARRANGEMENT_WORKERS", "1"))
+
+# Days of pick history the demand forecast is first built from
+FORECAST_HISTORY_DAYS = int(os.getenv("FORECAST_HISTORY_DAYS", "180"))
+# Days from ordering stock to having it on the shelf, and the safety factor
+# (standard deviations of demand over that time; 1.65 is about 95% service)
+REPLENISHMENT_LEAD_DAYS = int(os.getenv("REPLENISHMENT_LEAD_DAYS", "7"))
+SAFETY_STOCK_Z = float(os.getenv("SAFETY_STOCK_Z", "1.65"))
+# Days of history before a SKU's forecast is used by the arranger and alerts
+FORECAST_MIN_DAYS = int(os.getenv("FORECAST_MIN_DAYS", "14"))
+# Rank products for placement by the forecast ("forecast") instead of the
+# DemandPastMonth counter ("counter")
+ARRANGEMENT_DEMAND = os.getenv("ARRANGEMENT_DEMAND", "counter")
+# Use forecast reorder points as low-stock thresholds where none is set
+FORECAST_ALERTS = os.getenv("FORECAST_ALERTS", "false").lower() in ("1", "true", "yes")
+
+# Directory of stored warehouse snapshots, and rows per NDJSON chunk line
+SNAPSHOT_DIR = os.getenv(
+    "SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "snapshots"),
+)
+SNAPSHOT_CHUNK_ROWS = int(os.getenv("SNAPSHOT_CHUNK_ROWS", "1000"))
+# Store a snapshot before every full rearrangement, keeping the latest SNAPSHOT_KEEP
+SNAPSHOT_BEFORE_REARRANGE = os.getenv("SNAPSHOT_BEFORE_REARRANGE", "false").lower() in ("1", "true", "yes")
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "10"))
+
+# Bounds of the cached GET responses (every distinct query string is an entry)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Gzip cached and large JSON responses of at least this many bytes for clients
+# that accept it; 0 disables compression
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "0"))
+
+# Keep a sampled profile of requests slower than this; 0 disables the profiler
+PROFILE_SLOW_REQUESTS_MS = float(os.getenv("PROFILE_SLOW_REQUESTS_MS", "0"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+# Serve PUT /debug/profiler and GET /debug/profiles. They are unauthenticated
+# and expose the stacks of every thread, so they are off unless enabled
+DEBUG_ENDPOINTS = os.getenv("DEBUG_ENDPOINTS", "false").lower() in ("1", "true", "yes")
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from backend.app.models.item import ProductInventory
+from backend.app.models.item import ProductInventory, RackPlacement
 from app.schemas.product import ProductCreate
 
 def get_product(db: Session, product_id: str):
@@ -9,7 +9,15 @@ def get_products(db: Session, skip: int = 0, limit: int = 100):
     return db.query(ProductInventory).offset(skip).limit(limit).all()
 
 def get_products_by_location(db: Session, location: str):
-    return db.query(ProductInventory).filter(ProductInventory.ShelfLocation == location).all()
+    # location is a shelf such as "A3"; matches products with any rack on it
+    zone, shelf = location[:1], location[1:]
+    if not shelf.isdigit():
+        return []
+    return db.query(ProductInventory).filter(
+        ProductInventory.ProductID.in_(
+            db.query(RackPlacement.ProductID).filter(RackPlacement.zone == zone, RackPlacement.shelf == int(shelf))
+        )
+    ).all()
 
 def create_product(db: Session, product: ProductCreate):
     db_product = ProductInventory(**product.dict())
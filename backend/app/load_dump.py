@@ -0,0 +1,100 @@
+"""
+Import a MySQL dump such as data/warehouse (1).sql into the configured database.
+
+    python -m app.load_dump "data/warehouse (1).sql"
+
+Only the INSERT statements for product_inventory and rack_capacity are read;
+the tables themselves are created from the models, so the same dump loads
+into MySQL or SQLite. A full rearrangement runs afterwards to rebuild the
+rack placement index unless --keep-layout is given.
+"""
+import argparse
+import re
+import sys
+
+from sqlalchemy.orm import Session
+
+from app.database import Base, engine, SessionLocal
+from app.models.item import ProductInventory, RackCapacity, RackPlacement
+from app.services.arrangement import WarehouseArranger
+
+TABLES = {
+    "product_inventory": ProductInventory.__table__,
+    "rack_capacity": RackCapacity.__table__,
+}
+
+INSERT_RE = re.compile(r"^INSERT INTO `(\w+)` VALUES (.*);$")
+# One value inside a VALUES tuple: quoted string, NULL or number
+VALUE_RE = re.compile(r"\s*(?:'((?:[^'\\]|\\.|'')*)'|(NULL)|([-+0-9.eE]+))\s*([,)])")
+MYSQL_ESCAPES = {"0": "\0", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a", "b": "\b"}
+
+def unescape(value: str) -> str:
+    value = value.replace("''", "'")
+    return re.sub(r"\\(.)", lambda m: MYSQL_ESCAPES.get(m.group(1), m.group(1)), value)
+
+def parse_values(values: str):
+    """Yield each tuple of a MySQL extended INSERT as a list of Python values."""
+    pos = 0
+    while pos < len(values):
+        if values[pos] in ", \n":
+            pos += 1
+            continue
+        if values[pos] != "(":
+            raise ValueError(f"Unexpected {values[pos]!r} at offset {pos}")
+        pos += 1
+        row = []
+        while True:
+            match = VALUE_RE.match(values, pos)
+            if match is None:
+                raise ValueError(f"Cannot parse value at offset {pos}")
+            string, null, number, end = match.groups()
+            if null:
+                row.append(None)
+            elif number is not None:
+                row.append(float(number) if any(c in number for c in ".eE") else int(number))
+            else:
+                row.append(unescape(string))
+            pos = match.end()
+            if end == ")":
+                break
+        yield row
+
+def load_dump(path: str, db: Session, keep_layout: bool = False) -> dict:
+    Base.metadata.create_all(bind=engine)
+    counts = {}
+    with open(path, encoding="utf-8") as dump:
+        for line in dump:
+            match = INSERT_RE.match(line.strip())
+            if match is None or match.group(1) not in TABLES:
+                continue
+            table = TABLES[match.group(1)]
+            columns = [c.name for c in table.columns]
+            rows = [dict(zip(columns, row)) for row in parse_values(match.group(2))]
+            if table.name not in counts:
+                db.execute(table.delete())
+                counts[table.name] = 0
+            if rows:
+                db.execute(table.insert(), rows)
+            counts[table.name] += len(rows)
+    db.execute(RackPlacement.__table__.delete())
+    db.commit()
+    if not keep_layout:
+        WarehouseArranger.rearrange_inventory(db)
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load a MySQL warehouse dump into the configured database")
+    parser.add_argument("path", help="Path to the .sql dump")
+    parser.add_argument("--keep-layout", action="store_true",
+                        help="Keep the dump's rack_capacity and locations instead of rearranging")
+    args = parser.parse_args(argv)
+    db = SessionLocal()
+    try:
+        counts = load_dump(args.path, db, keep_layout=args.keep_layout)
+    finally:
+        db.close()
+    for table, count in counts.items():
+        print(f"{table}: {count} rows")
+
+if __name__ == "__main__":
+    sys.exit(main())
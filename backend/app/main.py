@@ -1,7 +1,19 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.inventory import router as inventory_router
-from app.database import engine, Base
+from app.api.alerts import router as alerts_router
+from app.api.analytics import router as analytics_router
+from app.api.picklists import router as picklists_router
+from app.api.forecast import router as forecast_router
+from app.api.snapshots import router as snapshots_router
+from app.api.metrics import debug_router, router as metrics_router
+from app.config import API_MODE, DEBUG_ENDPOINTS
+from app.database import engine, Base, SessionLocal, get_async_engine
+from app.services.alerts import alert_engine
+from app.services.forecasting import demand_forecaster
+from app.services.metrics import MetricsMiddleware, metrics
+from app.services.movements import MovementLog
+from app.services.scheduler import scheduler
 
 app = FastAPI()
 
@@ -13,13 +25,64 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so latency includes the other middleware
+app.add_middleware(MetricsMiddleware)
+metrics.instrument_engine(engine)
 
 # Include routers
+if API_MODE == "async":
+    from app.api.inventory_async import router as inventory_async_router
+
+    # Matched first, so its endpoints replace their sync counterparts
+    app.include_router(inventory_async_router, prefix="/api")
+    metrics.instrument_engine(get_async_engine().sync_engine)
 app.include_router(inventory_router, prefix="/api")
+app.include_router(alerts_router, prefix="/api")
+app.include_router(analytics_router, prefix="/api")
+app.include_router(picklists_router, prefix="/api")
+app.include_router(forecast_router, prefix="/api")
+app.include_router(snapshots_router, prefix="/api")
+app.include_router(metrics_router)
+if DEBUG_ENDPOINTS:
+    app.include_router(debug_router)
 
 # Create tables (only needed if using SQLAlchemy to create tables)
 Base.metadata.create_all(bind=engine)
 
+@app.on_event("startup")
+def start_scheduler():
+    scheduler.start()
+
+@app.on_event("startup")
+def create_rollup_watermark():
+    # Up front, so concurrent first folds only contend for its lock
+    db = SessionLocal()
+    try:
+        MovementLog.ensure_watermark(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def load_alerts():
+    db = SessionLocal()
+    try:
+        alert_engine.load(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def load_forecasts():
+    # After the alerts, which may take their thresholds from the forecasts
+    db = SessionLocal()
+    try:
+        demand_forecaster.load(db)
+    finally:
+        db.close()
+
+@app.on_event("shutdown")
+def stop_scheduler():
+    scheduler.stop()
+
 @app.get("/")
 def read_root():
     return {"message": "Warehouse Management System API"}
\ No newline at end of file
@@ -1,89 +1,105 @@
-from typing import List, Dict
-from sqlalchemy.orm import Session
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Boolean, Column, DateTime, Integer, String, Float, Index, UniqueConstraint
 from app.database import Base
 
 class ProductInventory(Base):
     __tablename__ = "product_inventory"
     ProductID = Column(String(10), primary_key=True, index=True)
     ProductName = Column(String(100))
-    Category = Column(String(50))
-    Quantity = Column(Integer)
-    DemandPastMonth = Column(Integer)
+    Category = Column(String(50), index=True)
+    Quantity = Column(Integer, index=True)
+    DemandPastMonth = Column(Integer, index=True)
     Price = Column(Float)
-    Zone = Column(String(1))
+    Zone = Column(String(1), index=True)
     ShelfLocation = Column(String(100))
     RackLocation = Column(String(100), nullable=True)
     IndividualWeight_kg = Column(Float)
     TotalWeight_kg = Column(Float)
 
-class WarehouseArranger:
-    ZONE_MAPPING = {
-        "groceries": "A",
-        "electronics": "B",
-        "clothing": "C",
-        "toys and games": "C",
-        "beauty and personal care": "D",
-        "fitness": "F",
-        "beverage": "G",
-        "books": "H",
-        "stationery": "I",
-        "home decor": "J"
-    }
-    
-    @staticmethod
-    def get_zone(category: str) -> str:
-        return WarehouseArranger.ZONE_MAPPING.get(category.lower(), "Z")
-    
-    @staticmethod
-    def rearrange_inventory(db: Session):
-        db.execute("TRUNCATE TABLE rack_capacity")
-        items = db.query(ProductInventory).order_by(ProductInventory.DemandPastMonth.desc()).all()
-        for item in items:
-            if not item.TotalWeight_kg:
-                item.TotalWeight_kg = item.IndividualWeight_kg * item.Quantity
-            item.Zone = WarehouseArranger.get_zone(item.Category)
-            remaining_quantity = item.Quantity
-            current_shelf = 1
-            current_rack = 1
-            shelf_numbers = []
-            rack_numbers = []
-            while remaining_quantity > 0:
-                rack = db.execute(
-                    f"SELECT used_weight FROM rack_capacity WHERE zone = '{item.Zone}' AND shelf = '{current_shelf}' AND rack = '{current_rack}'"
-                ).fetchone()
-                available_capacity = 100 - (rack.used_weight if rack else 0)
-                if available_capacity <= 0:
-                    current_rack += 1
-                    if current_rack > 10:
-                        current_shelf += 1
-                        current_rack = 1
-                    continue
-                weight_to_place = min(
-                    remaining_quantity * item.IndividualWeight_kg,
-                    available_capacity
-                )
-                quantity_to_place = int(weight_to_place / item.IndividualWeight_kg)
-                if quantity_to_place == 0 and remaining_quantity > 0:
-                    quantity_to_place = 1
-                if rack:
-                    db.execute(
-                        f"UPDATE rack_capacity SET used_weight = used_weight + {quantity_to_place * item.IndividualWeight_kg} "
-                        f"WHERE zone = '{item.Zone}' AND shelf = '{current_shelf}' AND rack = '{current_rack}'"
-                    )
-                else:
-                    db.execute(
-                        f"INSERT INTO rack_capacity (zone, shelf, rack, used_weight) "
-                        f"VALUES ('{item.Zone}', '{current_shelf}', '{current_rack}', {quantity_to_place * item.IndividualWeight_kg})"
-                    )
-                # Only append the numbers, not the zone
-                shelf_numbers.append(str(current_shelf))
-                rack_numbers.append(str(current_rack))
-                remaining_quantity -= quantity_to_place
-                current_rack += 1
-                if current_rack > 10:
-                    current_shelf += 1
-                    current_rack = 1
-            item.ShelfLocation = ",".join(shelf_numbers)
-            item.RackLocation = ",".join(rack_numbers)
-        db.commit()
\ No newline at end of file
+class RackCapacity(Base):
+    __tablename__ = "rack_capacity"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    zone = Column(String(1), nullable=False)
+    shelf = Column(Integer, nullable=False)
+    rack = Column(Integer, nullable=False)
+    used_weight = Column(Float, default=0)
+    __table_args__ = (UniqueConstraint("zone", "shelf", "rack", name="unique_rack"),)
+
+class RackPlacement(Base):
+    """Units of one product held on one rack; rebuilt by the arranger."""
+    __tablename__ = "rack_placement"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ProductID = Column(String(10), index=True)
+    zone = Column(String(1))
+    shelf = Column(Integer)
+    rack = Column(Integer)
+    quantity = Column(Integer)
+    weight = Column(Float)
+    __table_args__ = (Index("ix_rack_placement_slot", "zone", "shelf", "rack"),)
+
+class StockThreshold(Base):
+    """Low-stock alert levels for one product or one category."""
+    __tablename__ = "stock_threshold"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ProductID = Column(String(10), nullable=True, unique=True)
+    Category = Column(String(50), nullable=True, unique=True)
+    critical = Column(Integer)
+    warning = Column(Integer)
+
+class InventoryMovement(Base):
+    """Append-only log of every change to a product's Quantity."""
+    __tablename__ = "inventory_movement"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ProductID = Column(String(10), index=True)
+    Category = Column(String(50))
+    Zone = Column(String(1))
+    # create, receive, adjust or pick
+    kind = Column(String(10))
+    quantity_delta = Column(Integer)
+    quantity_after = Column(Integer)
+    created_at = Column(DateTime, index=True)
+    # Set once the movement is added to inventory_rollup
+    folded = Column(Boolean, default=False, server_default="0", nullable=False, index=True)
+
+class InventoryRollup(Base):
+    """Movement totals per hour or day bucket for one SKU, category or zone."""
+    __tablename__ = "inventory_rollup"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    bucket = Column(String(4))
+    bucket_start = Column(DateTime)
+    scope = Column(String(8))
+    key = Column(String(50))
+    received = Column(Integer, default=0)
+    picked = Column(Integer, default=0)
+    adjusted = Column(Integer, default=0)
+    stockouts = Column(Integer, default=0)
+    events = Column(Integer, default=0)
+    __table_args__ = (
+        UniqueConstraint("bucket", "scope", "key", "bucket_start", name="unique_rollup"),
+        Index("ix_inventory_rollup_series", "bucket", "scope", "bucket_start"),
+    )
+
+class RollupWatermark(Base):
+    """Single row each fold locks, so folds run one at a time; keeps the highest movement id folded."""
+    __tablename__ = "rollup_watermark"
+    id = Column(Integer, primary_key=True)
+    last_movement_id = Column(Integer, default=0)
+
+class DemandForecast(Base):
+    """Smoothed daily demand and reorder point of one SKU; rebuilt by the forecaster."""
+    __tablename__ = "demand_forecast"
+    ProductID = Column(String(10), primary_key=True)
+    level = Column(Float)
+    trend = Column(Float)
+    # Smoothed squared one-day-ahead error
+    error_var = Column(Float)
+    days = Column(Integer)
+    daily_forecast = Column(Float)
+    lead_time_demand = Column(Float)
+    safety_stock = Column(Float)
+    reorder_point = Column(Integer)
+
+class ForecastWatermark(Base):
+    """Last complete day folded into demand_forecast (single row)."""
+    __tablename__ = "forecast_watermark"
+    id = Column(Integer, primary_key=True)
+    through = Column(DateTime)
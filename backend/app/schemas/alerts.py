@@ -0,0 +1,41 @@
+from pydantic import BaseModel, Field, root_validator
+from typing import Optional
+
+class Alert(BaseModel):
+    id: str
+    type: str
+    title: str
+    item: str
+    message: str
+    priority: str
+    resolved: bool
+    ProductID: str
+    Category: Optional[str]
+    Quantity: int
+    threshold: int
+    since: str
+
+class StockThresholdBase(BaseModel):
+    ProductID: Optional[str] = Field(None, description="Set for a per-product threshold")
+    Category: Optional[str] = Field(None, description="Set for a per-category threshold")
+    critical: int = Field(..., ge=0)
+    warning: int = Field(..., ge=0)
+
+    @root_validator(skip_on_failure=True)
+    @classmethod
+    def validate_scope(cls, values):
+        if (values.get('ProductID') is None) == (values.get('Category') is None):
+            raise ValueError("Set exactly one of ProductID or Category")
+        if values['critical'] > values['warning']:
+            raise ValueError("critical must not exceed warning")
+        return values
+
+    class Config:
+        orm_mode = True
+        schema_extra = {
+            "example": {
+                "Category": "Groceries",
+                "critical": 20,
+                "warning": 100
+            }
+        }
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional
+from typing import List, Optional
 
 class InventoryBase(BaseModel):
     ProductID: str = Field(
@@ -74,4 +74,47 @@ class RackCapacityBase(BaseModel):
     used_weight: float
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class RackPlacementBase(BaseModel):
+    ProductID: str
+    zone: str
+    shelf: int
+    rack: int
+    quantity: int
+    weight: float
+
+    class Config:
+        orm_mode = True
+
+class RackContents(BaseModel):
+    zone: str
+    shelf: int
+    rack: int
+    used_weight: float
+    free_weight: float
+    items: List[RackPlacementBase]
+
+class PickLine(BaseModel):
+    ProductID: str
+    quantity: int = Field(..., gt=0)
+
+class PickRequest(BaseModel):
+    lines: List[PickLine] = Field(..., min_items=1)
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "lines": [
+                    {"ProductID": "P0001", "quantity": 2},
+                    {"ProductID": "P0042", "quantity": 1}
+                ]
+            }
+        }
+
+class PickResult(BaseModel):
+    ProductID: str
+    requested: int
+    picked: bool
+    Quantity: Optional[int]
+    error: Optional[str] = None
@@ -0,0 +1,57 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+class OrderLine(BaseModel):
+    ProductID: str
+    quantity: int = Field(..., gt=0)
+
+class Order(BaseModel):
+    order_id: str
+    lines: List[OrderLine] = Field(..., min_items=1)
+
+class PickListRequest(BaseModel):
+    orders: List[Order] = Field(..., min_items=1)
+    wave_size: int = Field(10, ge=1, description="Most orders picked together on one route")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "orders": [
+                    {"order_id": "SO-1001", "lines": [{"ProductID": "P0001", "quantity": 2}]},
+                    {"order_id": "SO-1002", "lines": [{"ProductID": "P0042", "quantity": 1},
+                                                      {"ProductID": "P0001", "quantity": 1}]}
+                ],
+                "wave_size": 10
+            }
+        }
+
+class PickAllocation(BaseModel):
+    order_id: str
+    ProductID: str
+    quantity: int
+
+class PickStop(BaseModel):
+    zone: str
+    shelf: int
+    rack: int
+    picks: List[PickAllocation]
+
+class PickWave(BaseModel):
+    wave: int
+    order_ids: List[str]
+    stops: List[PickStop]
+    distance_m: float
+    separate_distance_m: float
+
+class UnfulfilledLine(BaseModel):
+    order_id: str
+    ProductID: str
+    requested: int
+    missing: int
+
+class PickListResponse(BaseModel):
+    waves: List[PickWave]
+    unfulfilled: List[UnfulfilledLine]
+    distance_m: float
+    separate_distance_m: float
+    distance_saved_m: float
@@ -0,0 +1,190 @@
+import asyncio
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.item import ProductInventory, StockThreshold
+
+class AlertEngine:
+    """
+    Materialized set of low-stock alerts.
+
+    The full catalog is scanned once on load; after that only the rows touched
+    by a write are re-evaluated. Thresholds resolve per product, then per
+    category, then to the demand forecast's reorder point (FORECAST_ALERTS),
+    then to the defaults. Changes are pushed to every subscriber
+    queue (one per WebSocket connection).
+    """
+    DEFAULT_CRITICAL = 50
+    DEFAULT_WARNING = 250
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._active: Dict[str, dict] = {}
+        self._product_thresholds: Dict[str, tuple] = {}
+        self._category_thresholds: Dict[str, tuple] = {}
+        self._forecast_thresholds: Dict[str, tuple] = {}
+        self._subscribers = set()
+
+    def ensure_loaded(self, db: Session):
+        if not self._loaded:
+            self.load(db)
+
+    def load(self, db: Session):
+        thresholds = db.query(StockThreshold).all()
+        with self._lock:
+            self._product_thresholds = {
+                t.ProductID: (t.critical, t.warning) for t in thresholds if t.ProductID is not None
+            }
+            self._category_thresholds = {
+                t.Category.lower(): (t.critical, t.warning) for t in thresholds if t.Category is not None
+            }
+            self._active = {}
+            self._loaded = True
+        self.evaluate(self._alert_query(db).all(), publish=False)
+
+    def thresholds_for(self, product_id: str, category: Optional[str]) -> tuple:
+        if product_id in self._product_thresholds:
+            return self._product_thresholds[product_id]
+        category = (category or "").lower()
+        if category in self._category_thresholds:
+            return self._category_thresholds[category]
+        return self._forecast_thresholds.get(product_id, (self.DEFAULT_CRITICAL, self.DEFAULT_WARNING))
+
+    def set_forecast_thresholds(self, db: Session, thresholds: Dict[str, tuple]):
+        """Replace the forecast-derived (critical, warning) levels and re-evaluate the catalog."""
+        with self._lock:
+            self._forecast_thresholds = dict(thresholds)
+        if self._loaded:
+            self.evaluate(self._alert_query(db).all())
+
+    def set_threshold(self, db: Session, critical: int, warning: int,
+                      product_id: Optional[str] = None, category: Optional[str] = None):
+        """Store a product or category threshold and re-evaluate the rows it covers."""
+        query = db.query(StockThreshold)
+        if product_id is not None:
+            threshold = query.filter(StockThreshold.ProductID == product_id).first()
+        else:
+            threshold = query.filter(func.lower(StockThreshold.Category) == category.lower()).first()
+        if threshold is None:
+            threshold = StockThreshold(ProductID=product_id, Category=category)
+            db.add(threshold)
+        threshold.critical = critical
+        threshold.warning = warning
+        db.commit()
+
+        with self._lock:
+            if product_id is not None:
+                self._product_thresholds[product_id] = (critical, warning)
+            else:
+                self._category_thresholds[category.lower()] = (critical, warning)
+        rows = self._alert_query(db)
+        if product_id is not None:
+            rows = rows.filter(ProductInventory.ProductID == product_id)
+        else:
+            rows = rows.filter(func.lower(ProductInventory.Category) == category.lower())
+        self.evaluate(rows.all())
+        return threshold
+
+    def evaluate_ids(self, db: Session, product_ids: Iterable[str]):
+        product_ids = list(product_ids)
+        if product_ids and self._loaded:
+            self.evaluate(self._alert_query(db).filter(ProductInventory.ProductID.in_(product_ids)).all())
+
+    def evaluate_all(self, db: Session):
+        """Re-evaluate the whole catalog and resolve the alerts of products that no longer exist."""
+        if not self._loaded:
+            return
+        rows = self._alert_query(db).all()
+        present = {row.ProductID for row in rows}
+        with self._lock:
+            gone = [self._active.pop(pid) for pid in list(self._active) if pid not in present]
+        for alert in gone:
+            self._publish({'type': 'resolved', 'alert': {**alert, 'resolved': True}})
+        self.evaluate(rows)
+
+    def evaluate(self, rows, publish: bool = True):
+        """Re-evaluate `rows` (anything with ProductID, ProductName, Category and Quantity)."""
+        if not self._loaded:
+            return
+        events = []
+        with self._lock:
+            for row in rows:
+                critical, warning = self.thresholds_for(row.ProductID, row.Category)
+                quantity = row.Quantity or 0
+                if quantity < critical:
+                    priority, threshold = 'critical', critical
+                elif quantity < warning:
+                    priority, threshold = 'warning', warning
+                else:
+                    resolved = self._active.pop(row.ProductID, None)
+                    if resolved is not None:
+                        events.append({'type': 'resolved', 'alert': {**resolved, 'resolved': True}})
+                    continue
+                previous = self._active.get(row.ProductID)
+                alert = self._build_alert(row, quantity, priority, threshold, previous)
+                if alert != previous:
+                    self._active[row.ProductID] = alert
+                    events.append({'type': 'raised' if previous is None else 'updated', 'alert': alert})
+        if publish:
+            for event in events:
+                self._publish(event)
+
+    def alerts(self, priority: Optional[str] = None) -> List[dict]:
+        with self._lock:
+            alerts = [a for a in self._active.values() if priority is None or a['priority'] == priority]
+        return sorted(alerts, key=lambda a: (a['priority'] != 'critical', a['Quantity'], a['ProductID']))
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.add((loop, queue))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers = {(l, q) for l, q in self._subscribers if q is not queue}
+
+    def _publish(self, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # Event loop already closed
+                self.unsubscribe(queue)
+
+    @staticmethod
+    def _alert_query(db: Session):
+        return db.query(
+            ProductInventory.ProductID,
+            ProductInventory.ProductName,
+            ProductInventory.Category,
+            ProductInventory.Quantity,
+        )
+
+    @staticmethod
+    def _build_alert(row, quantity: int, priority: str, threshold: int, previous: Optional[dict]) -> dict:
+        label = 'critical threshold' if priority == 'critical' else 'low stock threshold'
+        return {
+            'id': row.ProductID,
+            'type': 'low-stock',
+            'title': 'Critical Stock Alert' if priority == 'critical' else 'Low Stock Alert',
+            'item': f"{row.ProductName} (SKU: {row.ProductID})",
+            'message': f"Only {quantity} units remaining ({label}: {threshold})",
+            'priority': priority,
+            'resolved': False,
+            'ProductID': row.ProductID,
+            'Category': row.Category,
+            'Quantity': quantity,
+            'threshold': threshold,
+            'since': previous['since'] if previous and previous['priority'] == priority
+                     else datetime.utcnow().isoformat(),
+        }
+
+alert_engine = AlertEngine()
@@ -1,89 +1,369 @@
-from app.models.item import ProductInventory
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from app.config import API_MODE, ARRANGEMENT_DEMAND, ARRANGEMENT_WORKERS, FORECAST_MIN_DAYS, WAREHOUSE_LAYOUT_PATH
+from app.models.item import DemandForecast, ProductInventory, RackPlacement
+from app.services.layout import WarehouseLayout, ZoneLayout
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import Integer, case, cast, func, text
+
+# What placement needs of a product; plain tuples so zones can be shipped to worker processes
+PlacementItem = namedtuple("PlacementItem", ["ProductID", "Quantity", "DemandPastMonth", "IndividualWeight_kg"])
+
+# Placement is CPU-bound: in async mode it always runs in worker processes so
+# it never holds the GIL the event loop needs
+OFFLOAD_PLACEMENT = ARRANGEMENT_WORKERS > 1 or API_MODE == "async"
+
+_placement_pool = None
+
+def _placement_executor():
+    global _placement_pool
+    if _placement_pool is None:
+        _placement_pool = ProcessPoolExecutor(max_workers=max(ARRANGEMENT_WORKERS, 1))
+    return _placement_pool
+
+def _placement_items(products):
+    return [PlacementItem(p.ProductID, p.Quantity, p.DemandPastMonth, p.IndividualWeight_kg) for p in products]
+
+def _place_zone_job(zone_layout: ZoneLayout, products, used=None):
+    return WarehouseArranger.place_zone(zone_layout.code, products, used, zone_layout=zone_layout)
 
 class WarehouseArranger:
-    ZONE_MAPPING = {
-        "groceries": "A",
-        "electronics": "B",
-        "clothing": "C",
-        "toys and games": "C",
-        "beauty and personal care": "D",
-        "fitness": "F",
-        "beverage": "G",
-        "books": "H",
-        "stationery": "I",
-        "home decor": "J"
-    }
+    # Zones, racks and category rules of the site
+    layout = WarehouseLayout.load(WAREHOUSE_LAYOUT_PATH)
+    # Tolerance when comparing recomputed weights with the stored FLOAT column
+    WEIGHT_EPSILON = 1e-3
 
     @staticmethod
     def get_zone(category: str) -> str:
-        return WarehouseArranger.ZONE_MAPPING.get(category.lower(), "Z")
-    
+        return WarehouseArranger.layout.zone_for(category)
+
     @staticmethod
-    def rearrange_inventory(db: Session):
-        db.execute(text("TRUNCATE TABLE rack_capacity"))
-        db.commit()
-        # Get all products
-        items = db.query(ProductInventory).all()
-        # Group by zone
-        zone_map = WarehouseArranger.ZONE_MAPPING
-        # Build zone->products dict
+    def place_zone(zone: str, products, used=None, zone_layout: ZoneLayout = None):
+        """
+        First-fit placement of `products` (already ordered by demand) into one zone.
+
+        `used` is a flat array of used weight per slot (see ZoneLayout.slot);
+        it is updated in place and returned. Returns (used, locations,
+        placements) where locations maps ProductID to the (ShelfLocation,
+        RackLocation) strings of every product that was placed and placements
+        maps it to its rack_placement rows.
+        """
+        if zone_layout is None:
+            zone_layout = WarehouseArranger.layout.zones[zone]
+        capacities = zone_layout.capacities
+        max_racks = zone_layout.racks_per_shelf
+        slots = zone_layout.slots
+        if used is None:
+            used = [0.0] * slots
+        locations = {}
+        placements = {}
+        for product in products:
+            if product.Quantity <= 0:
+                continue
+            product_weight = product.IndividualWeight_kg
+            if product_weight <= 0:
+                continue
+            remaining_quantity = product.Quantity
+            shelf_numbers = []
+            rack_numbers = []
+            rows = []
+            # Fill all racks of shelf 1, then shelf 2, etc.
+            for slot in range(slots):
+                available_capacity = capacities[slot] - used[slot]
+                max_units = int(available_capacity // product_weight)
+                if max_units <= 0:
+                    continue
+                units_to_place = min(max_units, remaining_quantity)
+                used[slot] += units_to_place * product_weight
+                shelf_num, rack_num = divmod(slot, max_racks)
+                shelf_numbers.append(f"{zone}{shelf_num + 1}")
+                rack_numbers.append(str(rack_num + 1))
+                rows.append({
+                    'product_id': product.ProductID,
+                    'zone': zone,
+                    'shelf': shelf_num + 1,
+                    'rack': rack_num + 1,
+                    'quantity': units_to_place,
+                    'weight': units_to_place * product_weight,
+                })
+                remaining_quantity -= units_to_place
+                if remaining_quantity <= 0:
+                    break
+            locations[product.ProductID] = (','.join(shelf_numbers), ','.join(rack_numbers))
+            placements[product.ProductID] = rows
+        return used, locations, placements
+
+    @staticmethod
+    def place_zones(zone_products: dict) -> dict:
+        """
+        Place every zone of `zone_products` (zone -> ranked products).
+
+        Returns zone -> place_zone result.
+        """
+        return WarehouseArranger.map_zones(_place_zone_job, zone_products)
+
+    @staticmethod
+    def map_zones(place, zone_products: dict) -> dict:
+        """
+        Apply `place(zone_layout, products)` to every zone of `zone_products`.
+
+        Zones are independent, so when placement is offloaded they are placed
+        concurrently on the process pool; `place` must then be picklable.
+        """
+        zones = WarehouseArranger.layout.zones
+        if not OFFLOAD_PLACEMENT:
+            return {zone: place(zones[zone], products) for zone, products in zone_products.items()}
+        futures = {
+            zone: _placement_executor().submit(place, zones[zone], _placement_items(products))
+            for zone, products in zone_products.items()
+        }
+        return {zone: future.result() for zone, future in futures.items()}
+
+    @staticmethod
+    def run_placement(place, zone_layout: ZoneLayout, products, *args):
+        """Run one placement call, on the process pool when placement is offloaded."""
+        if not OFFLOAD_PLACEMENT:
+            return place(zone_layout, products, *args)
+        return _placement_executor().submit(place, zone_layout, _placement_items(products), *args).result()
+
+    @staticmethod
+    def demand_query(db: Session, *columns):
+        """
+        Query `columns` plus the monthly demand products are ranked by, labelled DemandPastMonth.
+
+        With ARRANGEMENT_DEMAND=forecast that is 30 days of forecast demand
+        for SKUs with FORECAST_MIN_DAYS of history, else the counter.
+        """
+        if ARRANGEMENT_DEMAND != "forecast":
+            return db.query(*columns, ProductInventory.DemandPastMonth)
+        demand = case(
+            (DemandForecast.days >= FORECAST_MIN_DAYS, cast(func.round(DemandForecast.daily_forecast * 30), Integer)),
+            else_=ProductInventory.DemandPastMonth,
+        )
+        return db.query(*columns, demand.label("DemandPastMonth")).outerjoin(
+            DemandForecast, DemandForecast.ProductID == ProductInventory.ProductID
+        )
+
+    @staticmethod
+    def _placement_query(db: Session):
+        # Only the columns placement needs
+        return WarehouseArranger.demand_query(
+            db,
+            ProductInventory.ProductID,
+            ProductInventory.Category,
+            ProductInventory.Quantity,
+            ProductInventory.IndividualWeight_kg,
+            ProductInventory.Zone,
+            ProductInventory.ShelfLocation,
+            ProductInventory.RackLocation,
+        )
+
+    @staticmethod
+    def _zone_filter(zone: str):
+        layout = WarehouseArranger.layout
+        if zone == layout.default_zone:
+            # Everything not mapped to another zone
+            elsewhere = [c for c, z in layout.categories.items() if z != zone]
+            return ~func.lower(ProductInventory.Category).in_(elsewhere)
+        return func.lower(ProductInventory.Category).in_(layout.categories_in(zone))
+
+    @staticmethod
+    def _insert_placements(db: Session, rows):
+        if rows:
+            db.execute(text(
+                "INSERT INTO rack_placement (ProductID, zone, shelf, rack, quantity, weight) "
+                "VALUES (:product_id, :zone, :shelf, :rack, :quantity, :weight)"
+            ), rows)
+
+    @staticmethod
+    def zone_products(db: Session, zone: str = None) -> dict:
+        """Products of every zone (or just `zone`), ranked by DemandPastMonth."""
+        query = WarehouseArranger._placement_query(db)
+        if zone is not None:
+            query = query.filter(WarehouseArranger._zone_filter(zone))
         zone_products = {}
-        for item in items:
-            zone = zone_map.get(item.Category.lower(), 'Z')
-            if zone not in zone_products:
-                zone_products[zone] = []
-            zone_products[zone].append(item)
-        # For each zone
-        for zone, products in zone_products.items():
+        for item in query.all():
+            zone_products.setdefault(WarehouseArranger.get_zone(item.Category), []).append(item)
+        for products in zone_products.values():
             products.sort(key=lambda p: p.DemandPastMonth, reverse=True)
-            max_shelves = 20
-            max_racks = 10
-            rack_capacity = 100.0
-            for product in products:
-                if product.Quantity <= 0:
-                    continue
-                product_weight = product.IndividualWeight_kg
-                if product_weight <= 0:
-                    continue
-                remaining_quantity = product.Quantity
-                shelf_numbers = []
-                rack_numbers = []
-                # Fill all racks of shelf 1, then shelf 2, etc.
-                for shelf_num in range(1, max_shelves+1):
-                    for rack_num in range(1, max_racks+1):
-                        if remaining_quantity <= 0:
-                            break
-                        used_weight = db.execute(text(
-                            "SELECT used_weight FROM rack_capacity WHERE zone = :zone AND shelf = :shelf AND rack = :rack"
-                        ), {'zone': zone, 'shelf': shelf_num, 'rack': rack_num}).fetchone()
-                        current_weight = used_weight[0] if used_weight else 0.0
-                        available_capacity = rack_capacity - current_weight
-                        max_units = int(available_capacity // product_weight)
-                        if max_units <= 0:
-                            continue
-                        units_to_place = min(max_units, remaining_quantity)
-                        if units_to_place <= 0:
-                            continue
-                        weight_to_place = units_to_place * product_weight
-                        # Update rack_capacity
-                        if used_weight:
-                            db.execute(text(
-                                "UPDATE rack_capacity SET used_weight = used_weight + :used_weight WHERE zone = :zone AND shelf = :shelf AND rack = :rack"
-                            ), {'used_weight': weight_to_place, 'zone': zone, 'shelf': shelf_num, 'rack': rack_num})
-                        else:
-                            db.execute(text(
-                                "INSERT INTO rack_capacity (zone, shelf, rack, used_weight) VALUES (:zone, :shelf, :rack, :used_weight)"
-                            ), {'zone': zone, 'shelf': shelf_num, 'rack': rack_num, 'used_weight': weight_to_place})
-                        # Record shelf and rack
-                        shelf_numbers.append(f"{zone}{shelf_num}")
-                        rack_numbers.append(str(rack_num))
-                        remaining_quantity -= units_to_place
-                    if remaining_quantity <= 0:
-                        break
-                # Set all locations as comma-separated
-                product.Zone = zone
-                product.ShelfLocation = ','.join(shelf_numbers)
-                product.RackLocation = ','.join(rack_numbers)
-        db.commit()
\ No newline at end of file
+        return zone_products
+
+    @staticmethod
+    def _write_placed(db: Session, placed: dict):
+        """Insert rack and placement rows and set product locations for place_zones output."""
+        rack_rows = []
+        product_rows = []
+        placement_rows = []
+        for zone, (used, locations, placements) in placed.items():
+            zone_layout = WarehouseArranger.layout.zones[zone]
+            for slot, weight in enumerate(used):
+                if weight > 0:
+                    shelf, rack = zone_layout.location(slot)
+                    rack_rows.append({'zone': zone, 'shelf': shelf, 'rack': rack, 'used_weight': weight})
+            for product_id, (shelf_location, rack_location) in locations.items():
+                product_rows.append({
+                    'product_id': product_id,
+                    'zone': zone,
+                    'shelf_location': shelf_location,
+                    'rack_location': rack_location,
+                })
+            for rows in placements.values():
+                placement_rows.extend(rows)
+        if rack_rows:
+            db.execute(text(
+                "INSERT INTO rack_capacity (zone, shelf, rack, used_weight) VALUES (:zone, :shelf, :rack, :used_weight)"
+            ), rack_rows)
+        WarehouseArranger._insert_placements(db, placement_rows)
+        if product_rows:
+            db.execute(text(
+                "UPDATE product_inventory SET Zone = :zone, ShelfLocation = :shelf_location, RackLocation = :rack_location "
+                "WHERE ProductID = :product_id"
+            ), product_rows)
+
+    @staticmethod
+    def rearrange_inventory(db: Session, place_zones=None):
+        """
+        Re-place the whole warehouse in one transaction.
+
+        `place_zones` maps {zone: ranked products} to {zone: place_zone result};
+        first-fit (place_zones) unless another strategy is given.
+        """
+        # DELETE rather than TRUNCATE: portable, and readers keep seeing the
+        # old layout until the new one is committed
+        db.execute(text("DELETE FROM rack_capacity"))
+        zone_products = WarehouseArranger.zone_products(db)
+        placed = (place_zones or WarehouseArranger.place_zones)(zone_products)
+        db.execute(text("DELETE FROM rack_placement"))
+        WarehouseArranger._write_placed(db, placed)
+        db.commit()
+
+    @staticmethod
+    def replace_zone(db: Session, zone: str, products, placed_zone):
+        """Replace one zone's racks, placements and locations with a place_zone result."""
+        db.execute(text("DELETE FROM rack_capacity WHERE zone = :zone"), {'zone': zone})
+        db.execute(text("DELETE FROM rack_placement WHERE zone = :zone"), {'zone': zone})
+        product_ids = [p.ProductID for p in products]
+        if product_ids:
+            db.query(RackPlacement).filter(RackPlacement.ProductID.in_(product_ids)).delete(synchronize_session=False)
+        WarehouseArranger._write_placed(db, {zone: placed_zone})
+        db.commit()
+
+    @staticmethod
+    def rearrange_zone(db: Session, product_id: str, previous_demand: int = None):
+        """
+        Incrementally re-place the zone holding `product_id` after a single write.
+
+        Products ranked before the changed one keep their racks, so only the
+        changed product and those ranked after it (by DemandPastMonth, at the
+        earlier of its old and new rank) are re-placed. Rack rows and product
+        locations are updated in place instead of truncating rack_capacity.
+        Returns the list of rack rows whose used weight changed.
+        """
+        category = db.query(ProductInventory.Category).filter(
+            ProductInventory.ProductID == product_id
+        ).scalar()
+        if category is None:
+            return []
+        zone = WarehouseArranger.get_zone(category)
+        return WarehouseArranger.rearrange_zone_batch(db, zone, {product_id: previous_demand})
+
+    @staticmethod
+    def rearrange_zone_batch(db: Session, zone: str, changes: dict):
+        """
+        Same as rearrange_zone for several writes to one zone at once.
+
+        `changes` maps each written ProductID to its DemandPastMonth before the
+        writes (None if unchanged); re-placement starts at the earliest rank any
+        of them had before or after.
+        """
+        products = WarehouseArranger._placement_query(db).filter(
+            WarehouseArranger._zone_filter(zone)
+        ).all()
+
+        ranked = sorted(products, key=lambda p: p.DemandPastMonth, reverse=True)
+        # Ranking the stored placement was computed from
+        old_ranked = sorted(
+            products,
+            key=lambda p: p.DemandPastMonth if changes.get(p.ProductID) is None else changes[p.ProductID],
+            reverse=True,
+        )
+        start = min(
+            [i for i, p in enumerate(ranked) if p.ProductID in changes]
+            + [i for i, p in enumerate(old_ranked) if p.ProductID in changes],
+            default=0,
+        )
+
+        # Racks held by the unaffected prefix, then re-place the rest on top
+        zone_layout = WarehouseArranger.layout.zones[zone]
+        used, prefix_locations, _ = WarehouseArranger.run_placement(_place_zone_job, zone_layout, ranked[:start])
+        if any(
+            (p.Zone, p.ShelfLocation, p.RackLocation) != (zone, *prefix_locations[p.ProductID])
+            for p in ranked[:start] if p.ProductID in prefix_locations
+        ):
+            # The stored layout is not first-fit (e.g. left by the slotting
+            # optimizer), so the prefix cannot be replayed: re-place the zone
+            start = 0
+            used = None
+        used, locations, placements = WarehouseArranger.run_placement(
+            _place_zone_job, zone_layout, ranked[start:], used
+        )
+
+        product_rows = []
+        for product in ranked[start:]:
+            if product.ProductID not in locations:
+                continue
+            shelf_location, rack_location = locations[product.ProductID]
+            if (product.Zone, product.ShelfLocation, product.RackLocation) != (zone, shelf_location, rack_location):
+                product_rows.append({
+                    'product_id': product.ProductID,
+                    'zone': zone,
+                    'shelf_location': shelf_location,
+                    'rack_location': rack_location,
+                })
+
+        existing = {
+            (row[1], row[2]): (row[0], row[3] or 0.0)
+            for row in db.execute(text(
+                "SELECT id, shelf, rack, used_weight FROM rack_capacity WHERE zone = :zone"
+            ), {'zone': zone}).fetchall()
+        }
+        diff = []
+        inserts, updates, deletes = [], [], []
+        for slot, weight in enumerate(used):
+            key = zone_layout.location(slot)
+            rack_id, old_weight = existing.pop(key, (None, 0.0))
+            if abs(weight - old_weight) <= WarehouseArranger.WEIGHT_EPSILON:
+                continue
+            diff.append({'zone': zone, 'shelf': key[0], 'rack': key[1], 'old_weight': old_weight, 'new_weight': weight})
+            if rack_id is None:
+                inserts.append({'zone': zone, 'shelf': key[0], 'rack': key[1], 'used_weight': weight})
+            elif weight > 0:
+                updates.append({'id': rack_id, 'used_weight': weight})
+            else:
+                deletes.append({'id': rack_id})
+        # Rows outside the current layout are stale
+        for (shelf, rack), (rack_id, old_weight) in existing.items():
+            diff.append({'zone': zone, 'shelf': shelf, 'rack': rack, 'old_weight': old_weight, 'new_weight': 0.0})
+            deletes.append({'id': rack_id})
+
+        if deletes:
+            db.execute(text("DELETE FROM rack_capacity WHERE id = :id"), deletes)
+        if updates:
+            db.execute(text("UPDATE rack_capacity SET used_weight = :used_weight WHERE id = :id"), updates)
+        if inserts:
+            db.execute(text(
+                "INSERT INTO rack_capacity (zone, shelf, rack, used_weight) VALUES (:zone, :shelf, :rack, :used_weight)"
+            ), inserts)
+        # Placement rows of every re-placed product are rebuilt
+        replaced = [p.ProductID for p in ranked[start:]]
+        if replaced:
+            db.query(RackPlacement).filter(RackPlacement.ProductID.in_(replaced)).delete(synchronize_session=False)
+        WarehouseArranger._insert_placements(db, [row for rows in placements.values() for row in rows])
+        if product_rows:
+            db.execute(text(
+                "UPDATE product_inventory SET Zone = :zone, ShelfLocation = :shelf_location, RackLocation = :rack_location "
+                "WHERE ProductID = :product_id"
+            ), product_rows)
+        db.commit()
+        return diff
@@ -0,0 +1,116 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+
+from app.config import GZIP_MIN_BYTES, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_MAX_ENTRIES
+from app.services.serialization import accepts_gzip, compress, dumps, json_response
+
+class ResponseCache:
+    """
+    Process-local cache of serialized GET responses.
+
+    Entries belong to the current generation; every inventory write and
+    rearrangement calls bump(), which starts a new generation and drops them.
+    Large bodies are also kept gzipped (see GZIP_MIN_BYTES), so they are
+    compressed once per generation rather than once per request.
+
+    Keys include every query parameter (cursors, limits, field lists), so
+    the entries are bounded: past `max_entries` or `max_bytes` of bodies
+    the least recently used ones are evicted, and a body larger than
+    `max_bytes` is served without being cached.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._generation = 0
+        # key -> (etag, body, gzipped body or None, headers), least recently used first
+        self._entries: "OrderedDict[Hashable, Tuple[str, bytes, Optional[bytes], Dict[str, str]]]" = OrderedDict()
+        self._bytes = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def bump(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_or_build(self, key: Hashable, build: Callable[[], Tuple[object, Optional[Dict[str, str]]]]):
+        """
+        Return the cached (etag, body, gzipped, headers) for `key`, building it on a miss.
+
+        `build` returns the response data and any extra headers; the data is
+        serialized once and its hash becomes the strong ETag.
+        """
+        generation, entry = self._lookup(key)
+        if entry is not None:
+            return entry
+        data, headers = build()
+        return self._store(key, generation, data, headers)
+
+    async def get_or_build_async(self, key: Hashable,
+                                 build: Callable[[], Awaitable[Tuple[object, Optional[Dict[str, str]]]]]):
+        """get_or_build with a coroutine function as `build`."""
+        generation, entry = self._lookup(key)
+        if entry is not None:
+            return entry
+        data, headers = await build()
+        return self._store(key, generation, data, headers)
+
+    def _lookup(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return self._generation, entry
+
+    def _store(self, key: Hashable, generation: int, data, headers: Optional[Dict[str, str]]):
+        body = dumps(data)
+        entry = ('"%s"' % hashlib.sha1(body).hexdigest(), body, compress(body), headers or {})
+        size = self._size(entry)
+        with self._lock:
+            # A write during the build makes this entry stale already
+            if self._generation == generation and size <= self.max_bytes:
+                previous = self._entries.pop(key, None)
+                if previous is not None:
+                    self._bytes -= self._size(previous)
+                self._entries[key] = entry
+                self._bytes += size
+                while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= self._size(evicted)
+        return entry
+
+    @staticmethod
+    def _size(entry) -> int:
+        _, body, gzipped, _ = entry
+        return len(body) + (len(gzipped) if gzipped is not None else 0)
+
+    def respond(self, request: Request, key: Hashable, build) -> Response:
+        return self._response(request, self.get_or_build(key, build))
+
+    async def respond_async(self, request: Request, key: Hashable, build) -> Response:
+        return self._response(request, await self.get_or_build_async(key, build))
+
+    @staticmethod
+    def _response(request: Request, entry) -> Response:
+        etag, body, gzipped, headers = entry
+        if gzipped is not None and accepts_gzip(request):
+            # Each encoding is its own representation with its own strong ETag
+            etag = etag[:-1] + '-gzip"'
+        headers = {**headers, "ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            if GZIP_MIN_BYTES:
+                headers["Vary"] = "Accept-Encoding"
+            return Response(status_code=304, headers=headers)
+        return json_response(request, body, gzipped, headers)
+
+response_cache = ResponseCache()
@@ -0,0 +1,295 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import bindparam, insert, select
+from sqlalchemy.orm import Session
+
+from app.config import FORECAST_ALERTS, FORECAST_HISTORY_DAYS, FORECAST_MIN_DAYS, REPLENISHMENT_LEAD_DAYS, SAFETY_STOCK_Z
+from app.database import SessionLocal
+from app.models.item import DemandForecast, ForecastWatermark, InventoryRollup
+from app.services.alerts import alert_engine
+from app.services.movements import MovementLog
+
+logger = logging.getLogger(__name__)
+
+DAY = timedelta(days=1)
+
+class DemandForecaster:
+    """
+    Per-SKU daily demand forecasts and reorder points.
+
+    Each SKU's daily picks (the "picked" counter of its day rollups) are
+    smoothed with Holt's linear method: a level, a trend and the smoothed
+    squared one-day-ahead error. Every SKU advances one day per vectorized
+    array step, so the catalog costs one numpy update per day rather than a
+    Python loop per SKU. The state is stored with the last complete day it
+    covers and update() folds only the days completed since; a SKU's
+    history starts on its first day with any movement.
+
+    The reorder point is the demand projected over the replenishment lead
+    time plus SAFETY_STOCK_Z standard deviations of it. Stock below the
+    projected demand alone is critical.
+
+    Updates build the new state off to the side and swap it in under the
+    lock, and readers take the ids and arrays in one critical section, so a
+    reader sees one state or the next, never a mix or the empty state of a
+    rebuild.
+    """
+    ALPHA = 0.3
+    BETA = 0.1
+
+    def __init__(self, history_days: int = FORECAST_HISTORY_DAYS, lead_days: int = REPLENISHMENT_LEAD_DAYS,
+                 safety_z: float = SAFETY_STOCK_Z, session_factory=SessionLocal):
+        self.history_days = history_days
+        self.lead_days = lead_days
+        self.safety_z = safety_z
+        self.session_factory = session_factory
+        # Guards swapping the state below (replaced, never mutated in place);
+        # _update_lock serializes whole updates
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._refreshing = False
+        self._loaded = False
+        self.through: Optional[datetime] = None
+        self._index: Dict[str, int] = {}
+        self.product_ids: List[str] = []
+        self.level = np.zeros(0)
+        self.trend = np.zeros(0)
+        self.error_var = np.zeros(0)
+        self.days = np.zeros(0, dtype=int)
+
+    def ensure_loaded(self, db: Session):
+        if not self._loaded:
+            self.load(db)
+
+    def load(self, db: Session):
+        """Restore the stored state, then fold the days completed since."""
+        rows = db.query(
+            DemandForecast.ProductID, DemandForecast.level, DemandForecast.trend,
+            DemandForecast.error_var, DemandForecast.days,
+        ).all()
+        watermark = db.query(ForecastWatermark.through).filter(ForecastWatermark.id == 1).scalar()
+        with self._update_lock, self._lock:
+            self.product_ids = [r.ProductID for r in rows]
+            self._index = {pid: i for i, pid in enumerate(self.product_ids)}
+            self.level = np.array([r.level or 0.0 for r in rows], dtype=float)
+            self.trend = np.array([r.trend or 0.0 for r in rows], dtype=float)
+            self.error_var = np.array([r.error_var or 0.0 for r in rows], dtype=float)
+            self.days = np.array([r.days or 0 for r in rows], dtype=int)
+            self.through = watermark if rows else None
+            self._loaded = True
+        self.update(db)
+
+    def update(self, db: Session, full: bool = False) -> dict:
+        """
+        Fold every complete day after the watermark into the forecasts.
+
+        `full` discards the state and rebuilds it from the last
+        FORECAST_HISTORY_DAYS of history. Returns the days folded and SKUs covered.
+        """
+        with self._update_lock:
+            MovementLog.fold(db)
+            today = MovementLog.bucket_start(datetime.utcnow(), "day")
+            product_ids, index, level, trend, error_var, days, through = self._state()
+            if full or through is None:
+                product_ids, index = [], {}
+                level, trend, error_var = np.zeros(0), np.zeros(0), np.zeros(0)
+                days = np.zeros(0, dtype=int)
+                start = today - self.history_days * DAY
+            else:
+                start = through + DAY
+            n_days = (today - start).days
+            if n_days <= 0:
+                return {'days': 0, 'skus': len(product_ids), 'through': through}
+
+            product_ids, index, picked, events = self._history(db, start, n_days, product_ids, index)
+            grow = len(product_ids) - len(level)
+            level, trend, error_var, days = (
+                np.concatenate([a, np.zeros(grow, dtype=a.dtype)]) for a in (level, trend, error_var, days)
+            )
+            level, trend, error_var, days = self.smooth(level, trend, error_var, days, picked, events)
+            with self._lock:
+                self.product_ids, self._index = product_ids, index
+                self.level, self.trend, self.error_var, self.days = level, trend, error_var, days
+                self.through = today - DAY
+            self._save(db)
+            if FORECAST_ALERTS:
+                alert_engine.set_forecast_thresholds(db, self.thresholds())
+            return {'days': n_days, 'skus': len(product_ids), 'through': self.through}
+
+    def refresh_if_due(self):
+        """Fold a newly completed day on a background thread; cheap when there is none."""
+        if not self._loaded or self.through is None:
+            return
+        if MovementLog.bucket_start(datetime.utcnow(), "day") - self.through <= DAY:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name="forecast-refresh", daemon=True).start()
+
+    def _refresh(self):
+        db = self.session_factory()
+        try:
+            self.update(db)
+        except Exception:
+            logger.exception("Forecast refresh failed")
+            db.rollback()
+        finally:
+            db.close()
+            with self._lock:
+                self._refreshing = False
+
+    def _state(self) -> tuple:
+        """(product_ids, index, level, trend, error_var, days, through), all from one state."""
+        with self._lock:
+            return (self.product_ids, self._index, self.level, self.trend, self.error_var, self.days,
+                    self.through)
+
+    def _history(self, db: Session, start: datetime, n_days: int, product_ids: List[str], index: Dict[str, int]):
+        """
+        Picks and movement counts per SKU and day as (SKUs x days) matrices.
+
+        SKUs new to `product_ids` are appended to copies of it and `index`;
+        returns (product_ids, index, picked, events).
+        """
+        # One Core query per day: no ORM rows and no per-row date parsing
+        table = InventoryRollup.__table__
+        statement = select(table.c.key, table.c.picked, table.c.events).where(
+            table.c.bucket == "day", table.c.scope == "sku", table.c.bucket_start == bindparam("day")
+        )
+        # A session of its own: db's transaction may predate the fold that
+        # just committed these rollups
+        with Session(bind=db.get_bind()) as history:
+            by_day = [history.execute(statement, {'day': start + d * DAY}).fetchall() for d in range(n_days)]
+        product_ids, index = list(product_ids), dict(index)
+        for rows in by_day:
+            for key, _, _ in rows:
+                if key not in index:
+                    index[key] = len(product_ids)
+                    product_ids.append(key)
+        picked = np.zeros((len(product_ids), n_days))
+        events = np.zeros((len(product_ids), n_days))
+        for d, rows in enumerate(by_day):
+            if rows:
+                keys, day_picked, day_events = zip(*rows)
+                skus = np.array([index[key] for key in keys], dtype=int)
+                picked[skus, d] = np.clip(np.array(day_picked, dtype=float), 0, None)
+                events[skus, d] = np.array(day_events, dtype=float)
+        return product_ids, index, picked, events
+
+    @staticmethod
+    def smooth(level, trend, error_var, days, picked, events):
+        """Advance every SKU's state over the columns (days) of `picked`; returns new arrays."""
+        alpha, beta = DemandForecaster.ALPHA, DemandForecaster.BETA
+        level, trend, error_var, days = level.copy(), trend.copy(), error_var.copy(), days.copy()
+        for d in range(picked.shape[1]):
+            y = picked[:, d]
+            started = days > 0
+            # A SKU's first active day seeds its level
+            first = ~started & (events[:, d] > 0)
+            predicted = level + trend
+            error = y - predicted
+            new_level = alpha * y + (1 - alpha) * predicted
+            trend = np.where(started, beta * (new_level - level) + (1 - beta) * trend, trend)
+            error_var = np.where(started, alpha * error ** 2 + (1 - alpha) * error_var, error_var)
+            level = np.where(started, new_level, np.where(first, y, level))
+            days = days + (started | first)
+        return level, trend, error_var, days
+
+    def _outputs(self, level, trend, error_var):
+        horizon = np.arange(1, self.lead_days + 1)
+        projected = np.clip(level[:, None] + trend[:, None] * horizon, 0, None)
+        lead_time_demand = projected.sum(axis=1)
+        safety_stock = self.safety_z * np.sqrt(self.lead_days * error_var)
+        return {
+            'daily_forecast': np.clip(level + trend, 0, None),
+            'lead_time_demand': lead_time_demand,
+            'safety_stock': safety_stock,
+            'reorder_point': np.ceil(lead_time_demand + safety_stock - 1e-9).astype(int),
+        }
+
+    def _save(self, db: Session):
+        product_ids, _, level, trend, error_var, days, through = self._state()
+        outputs = self._outputs(level, trend, error_var)
+        rows = [
+            {
+                'ProductID': pid,
+                'level': float(level[i]),
+                'trend': float(trend[i]),
+                'error_var': float(error_var[i]),
+                'days': int(days[i]),
+                'daily_forecast': float(outputs['daily_forecast'][i]),
+                'lead_time_demand': float(outputs['lead_time_demand'][i]),
+                'safety_stock': float(outputs['safety_stock'][i]),
+                'reorder_point': int(outputs['reorder_point'][i]),
+            }
+            for i, pid in enumerate(product_ids)
+        ]
+        db.query(DemandForecast).delete(synchronize_session=False)
+        if rows:
+            db.execute(insert(DemandForecast.__table__), rows)
+        watermark = db.query(ForecastWatermark).filter(ForecastWatermark.id == 1).first()
+        if watermark is None:
+            db.add(ForecastWatermark(id=1, through=through))
+        else:
+            watermark.through = through
+        db.commit()
+
+    def forecasts(self) -> List[dict]:
+        """Forecast of every SKU with history, in ProductID order."""
+        product_ids, _, level, trend, error_var, days, _ = self._state()
+        outputs = self._outputs(level, trend, error_var)
+        return sorted((
+            {
+                'ProductID': pid,
+                'days': int(days[i]),
+                'daily_forecast': round(float(outputs['daily_forecast'][i]), 3),
+                'lead_time_demand': round(float(outputs['lead_time_demand'][i]), 3),
+                'safety_stock': round(float(outputs['safety_stock'][i]), 3),
+                'reorder_point': int(outputs['reorder_point'][i]),
+            }
+            for i, pid in enumerate(product_ids)
+        ), key=lambda f: f['ProductID'])
+
+    def forecast(self, product_id: str, horizon: int) -> Optional[dict]:
+        """One SKU's forecast with its projected demand for each of the next `horizon` days."""
+        with self._lock:
+            i = self._index.get(product_id)
+            if i is None:
+                return None
+            level, trend, error_var, days = self.level[i], self.trend[i], self.error_var[i], self.days[i]
+            through = self.through or MovementLog.bucket_start(datetime.utcnow(), "day") - DAY
+        projected = np.clip(level + trend * np.arange(1, horizon + 1), 0, None)
+        lead_time_demand = float(np.clip(level + trend * np.arange(1, self.lead_days + 1), 0, None).sum())
+        safety_stock = float(self.safety_z * np.sqrt(self.lead_days * error_var))
+        return {
+            'ProductID': product_id,
+            'days': int(days),
+            'through': through,
+            'level': round(float(level), 3),
+            'trend': round(float(trend), 3),
+            'daily_forecast': round(float(max(level + trend, 0.0)), 3),
+            'lead_time_demand': round(lead_time_demand, 3),
+            'safety_stock': round(safety_stock, 3),
+            'reorder_point': int(np.ceil(lead_time_demand + safety_stock - 1e-9)),
+            'projection': [
+                {'date': (through + (h + 1) * DAY).date().isoformat(), 'demand': round(float(v), 3)}
+                for h, v in enumerate(projected)
+            ],
+        }
+
+    def thresholds(self) -> Dict[str, tuple]:
+        """(critical, warning) alert levels of SKUs with enough history: lead-time demand and reorder point."""
+        product_ids, _, level, trend, error_var, days, _ = self._state()
+        outputs = self._outputs(level, trend, error_var)
+        return {
+            product_ids[i]: (int(np.ceil(outputs['lead_time_demand'][i] - 1e-9)), int(outputs['reorder_point'][i]))
+            for i in np.flatnonzero(days >= FORECAST_MIN_DAYS)
+        }
+
+demand_forecaster = DemandForecaster()
@@ -0,0 +1,225 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Dict, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from app.config import BULK_INGEST_BATCH_SIZE
+from app.models.item import ProductInventory
+from app.schemas.inventory import InventoryCreate
+from app.services.cache import response_cache
+from app.services.alerts import alert_engine
+from app.services.movements import MovementLog
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream and yield it line by line without buffering it whole."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+class IncompleteRecord(Exception):
+    """Raised to the csv reader when a record continues past the lines received so far."""
+
+class CsvLines:
+    """
+    Line source of one csv.reader fed from an async stream.
+
+    Holds the lines of the record being parsed. When the reader asks for a
+    line that has not arrived yet, it gets IncompleteRecord and the record
+    is replayed from its first line once the next one is added.
+    """
+
+    def __init__(self):
+        self.lines: List[str] = []
+        self.position = 0
+
+    def add(self, line: str):
+        self.lines.append(line)
+        self.position = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if self.position == len(self.lines):
+            raise IncompleteRecord
+        self.position += 1
+        return self.lines[self.position - 1] + "\n"
+
+async def iter_records(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Tuple[int, object]]:
+    """
+    Yield (row number, record) pairs from a CSV or NDJSON stream.
+
+    The record is a dict of raw field values, or the error message if the
+    row could not be parsed.
+    """
+    row = 0
+    header = None
+    source = CsvLines()
+    reader = csv.reader(source)
+    async for line in iter_lines(chunks):
+        if fmt == "csv":
+            # The csv module decides where a record ends, so quoted fields
+            # may span lines and stray quotes in unquoted fields are literal
+            source.add(line)
+            try:
+                values = next(reader)
+            except IncompleteRecord:
+                continue
+            except csv.Error as e:
+                source.lines = []
+                row += 1
+                yield row, f"Invalid CSV: {e}"
+                continue
+            source.lines = []
+            if not any(v.strip() for v in values):
+                continue
+            if header is None:
+                header = [v.strip() for v in values]
+                continue
+            row += 1
+            if len(values) != len(header):
+                yield row, f"Expected {len(header)} columns, got {len(values)}"
+            else:
+                yield row, dict(zip(header, values))
+        else:
+            if not line.strip():
+                continue
+            row += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield row, "Expected a JSON object"
+            else:
+                yield row, record
+    if source.lines:
+        yield row + 1, "Unterminated quoted field"
+
+class BulkIngestor:
+    """
+    Validates and upserts inventory rows in batches.
+
+    Rows follow create_item semantics: a row matching an existing product by
+    ProductName and Category adds to its Quantity, anything else is inserted.
+    Invalid rows are collected in `errors` and never abort the rest of the load.
+    """
+
+    def __init__(self, db: Session, batch_size: int = BULK_INGEST_BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+        self.batch: List[Tuple[int, InventoryCreate]] = []
+        self.inserted = 0
+        self.updated = 0
+        self.errors: List[Dict] = []
+
+    def add(self, row: int, record) -> bool:
+        """Validate one record; returns True once a batch is ready to flush."""
+        if isinstance(record, str):
+            self.errors.append({'row': row, 'errors': [record]})
+            return False
+        try:
+            item = InventoryCreate.parse_obj(record)
+        except ValidationError as e:
+            self.errors.append({
+                'row': row,
+                'errors': [f"{'.'.join(str(l) for l in err['loc'])}: {err['msg']}" for err in e.errors()],
+            })
+            return False
+        self.batch.append((row, item))
+        return len(self.batch) >= self.batch_size
+
+    def flush(self):
+        batch, self.batch = self.batch, []
+        if not batch:
+            return
+        db = self.db
+        names = {item.ProductName for _, item in batch}
+        existing_rows = {
+            (r.ProductName, r.Category): r
+            for r in db.query(
+                ProductInventory.ProductID, ProductInventory.ProductName, ProductInventory.Category,
+                ProductInventory.Quantity,
+            ).filter(ProductInventory.ProductName.in_(names))
+        }
+        existing = {key: r.ProductID for key, r in existing_rows.items()}
+        taken_ids = {
+            r.ProductID
+            for r in db.query(ProductInventory.ProductID)
+            .filter(ProductInventory.ProductID.in_({item.ProductID for _, item in batch}))
+        }
+
+        inserts: Dict[Tuple[str, str], dict] = {}
+        increments: Dict[str, int] = {}
+        rows_in_batch = []
+        for row, item in batch:
+            key = (item.ProductName, item.Category)
+            if key in existing:
+                increments[existing[key]] = increments.get(existing[key], 0) + item.Quantity
+                self.updated += 1
+            elif key in inserts:
+                # Repeated within the manifest: merge into the pending insert
+                pending = inserts[key]
+                pending['Quantity'] += item.Quantity
+                pending['TotalWeight_kg'] = pending['Quantity'] * pending['IndividualWeight_kg']
+                self.updated += 1
+            elif item.ProductID in taken_ids:
+                self.errors.append({'row': row, 'errors': [f"ProductID {item.ProductID} already exists"]})
+                continue
+            else:
+                inserts[key] = item.dict()
+                taken_ids.add(item.ProductID)
+                self.inserted += 1
+            rows_in_batch.append(row)
+
+        try:
+            if inserts:
+                db.execute(insert(ProductInventory.__table__).values(list(inserts.values())))
+            if increments:
+                # TotalWeight_kg first: MySQL applies SET assignments left to right
+                db.execute(text(
+                    "UPDATE product_inventory SET TotalWeight_kg = (Quantity + :quantity) * IndividualWeight_kg, "
+                    "Quantity = Quantity + :quantity WHERE ProductID = :product_id"
+                ), [{'product_id': pid, 'quantity': qty} for pid, qty in increments.items()])
+            quantities = {r.ProductID: r for r in existing_rows.values()}
+            MovementLog.record(db, [
+                {
+                    'ProductID': item['ProductID'], 'Category': item['Category'], 'kind': 'create',
+                    'quantity_delta': item['Quantity'], 'quantity_after': item['Quantity'],
+                }
+                for item in inserts.values()
+            ] + [
+                {
+                    'ProductID': pid, 'Category': quantities[pid].Category, 'kind': 'receive',
+                    'quantity_delta': qty, 'quantity_after': quantities[pid].Quantity + qty,
+                }
+                for pid, qty in increments.items()
+            ])
+            db.commit()
+            response_cache.bump()
+            alert_engine.evaluate_ids(db, [item['ProductID'] for item in inserts.values()] + list(increments))
+        except Exception as e:
+            db.rollback()
+            self.inserted -= len(inserts)
+            self.updated -= len(rows_in_batch) - len(inserts)
+            self.errors.extend({'row': row, 'errors': [f"Batch write failed: {e}"]} for row in rows_in_batch)
+
+    def summary(self) -> dict:
+        return {
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'failed': len(self.errors),
+            'errors': sorted(self.errors, key=lambda e: e['row']),
+        }
@@ -0,0 +1,116 @@
+import json
+import re
+from typing import Dict, List, Optional
+
+class ZoneLayout:
+    """
+    Shelves and racks of one zone.
+
+    Racks are addressed by slot, (shelf - 1) * racks_per_shelf + (rack - 1),
+    which is also the order the arranger fills them in.
+    """
+
+    def __init__(self, code: str, shelves: int, racks_per_shelf: int, rack_capacity_kg: float,
+                 rack_limits: Optional[Dict[str, float]] = None, dock_distance_m: float = 0.0,
+                 shelf_spacing_m: float = 1.0, rack_spacing_m: float = 1.0):
+        self.code = code
+        self.shelves = shelves
+        self.racks_per_shelf = racks_per_shelf
+        self.rack_capacity_kg = rack_capacity_kg
+        # Position of each slot on the floor, dock at the origin: x runs along
+        # the main aisle to the zone and its shelves, y along the shelf to the rack
+        self.xs = [dock_distance_m + shelf * shelf_spacing_m for shelf in range(shelves) for _ in range(racks_per_shelf)]
+        self.ys = [rack * rack_spacing_m for _ in range(shelves) for rack in range(racks_per_shelf)]
+        # Walking distance from the dock to each slot
+        self.distances = [x + y for x, y in zip(self.xs, self.ys)]
+        # Weight limit per slot; rack_limits overrides single racks as {"shelf-rack": kg}
+        self.capacities = [float(rack_capacity_kg)] * (shelves * racks_per_shelf)
+        for location, limit in (rack_limits or {}).items():
+            shelf, rack = (int(n) for n in location.split("-"))
+            if not self.has_rack(shelf, rack):
+                raise ValueError(f"Zone {code} has no rack {location}")
+            self.capacities[self.slot(shelf, rack)] = float(limit)
+
+    @property
+    def slots(self) -> int:
+        return len(self.capacities)
+
+    def has_rack(self, shelf: int, rack: int) -> bool:
+        return 1 <= shelf <= self.shelves and 1 <= rack <= self.racks_per_shelf
+
+    def slot(self, shelf: int, rack: int) -> int:
+        return (shelf - 1) * self.racks_per_shelf + (rack - 1)
+
+    def location(self, slot: int):
+        """(shelf, rack) of a slot."""
+        shelf, rack = divmod(slot, self.racks_per_shelf)
+        return shelf + 1, rack + 1
+
+    def capacity(self, shelf: int, rack: int) -> float:
+        return self.capacities[self.slot(shelf, rack)]
+
+class WarehouseLayout:
+    """
+    Zones of a site and the rules assigning categories to them.
+
+    Loaded from a JSON definition (see data/layout.json):
+
+        {
+          "default_zone": "Z",
+          "defaults": {"shelves": 20, "racks_per_shelf": 10, "rack_capacity_kg": 100},
+          "zones": {"A": {}, "B": {"shelves": 40, "rack_limits": {"1-1": 250}, "dock_distance_m": 30}, ...},
+          "categories": {"groceries": "A", ...}
+        }
+
+    Per-zone entries override the defaults. dock_distance_m, shelf_spacing_m
+    and rack_spacing_m (0, 1 and 1 by default) place racks relative to the
+    dock for the slotting optimizer. Category names match
+    case-insensitively; anything unmapped goes to the default zone.
+    """
+
+    def __init__(self, zones: Dict[str, ZoneLayout], categories: Dict[str, str], default_zone: str):
+        for code in zones:
+            # Zone codes are stored in single-character columns
+            if not re.fullmatch(r"[A-Z]", code):
+                raise ValueError(f"Zone code {code!r} must be a single uppercase letter")
+        if default_zone not in zones:
+            raise ValueError(f"Default zone {default_zone} is not defined")
+        for category, zone in categories.items():
+            if zone not in zones:
+                raise ValueError(f"Category {category!r} maps to undefined zone {zone}")
+        self.zones = zones
+        self.categories = {category.lower(): zone for category, zone in categories.items()}
+        self.default_zone = default_zone
+
+    @classmethod
+    def from_dict(cls, definition: dict) -> "WarehouseLayout":
+        defaults = definition.get("defaults", {})
+        zones = {}
+        for code, spec in definition["zones"].items():
+            spec = {**defaults, **(spec or {})}
+            zones[code] = ZoneLayout(
+                code,
+                shelves=int(spec["shelves"]),
+                racks_per_shelf=int(spec["racks_per_shelf"]),
+                rack_capacity_kg=float(spec["rack_capacity_kg"]),
+                rack_limits=spec.get("rack_limits"),
+                dock_distance_m=float(spec.get("dock_distance_m", 0.0)),
+                shelf_spacing_m=float(spec.get("shelf_spacing_m", 1.0)),
+                rack_spacing_m=float(spec.get("rack_spacing_m", 1.0)),
+            )
+        return cls(zones, definition.get("categories", {}), definition["default_zone"])
+
+    @classmethod
+    def load(cls, path: str) -> "WarehouseLayout":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    @property
+    def zone_codes(self) -> List[str]:
+        return sorted(self.zones)
+
+    def zone_for(self, category: str) -> str:
+        return self.categories.get(category.lower(), self.default_zone)
+
+    def categories_in(self, zone: str) -> List[str]:
+        return [category for category, z in self.categories.items() if z == zone]
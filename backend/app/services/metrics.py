@@ -0,0 +1,224 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+from sqlalchemy import event
+
+from app.services.profiler import profiler
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def total(self) -> float:
+        with self._lock:
+            return sum(self._values.values())
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        # labels -> [count per bucket..., +Inf count, sum]
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = sorted((labels, list(values)) for labels, values in self._series.items())
+        for labels, values in series:
+            for bound, count in zip(self.buckets, values):
+                le = 'le="%s"' % bound
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {count}"
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {values[-2]}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {values[-1]}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {values[-2]}"
+
+class QueryStats:
+    """Statements and database time of one request or operation."""
+
+    def __init__(self, scope: str):
+        self.scope = scope
+        self.statements = 0
+        self.db_seconds = 0.0
+
+_current_stats: contextvars.ContextVar = contextvars.ContextVar("query_stats", default=None)
+
+class Metrics:
+    """
+    Process-wide request, operation and database metrics.
+
+    The middleware times every HTTP request by route template; SQLAlchemy
+    engine events add each statement and its duration to the request (or
+    tracked background operation) running in the current context.
+    Synchronous endpoints run in the threadpool with a copy of that
+    context, so their statements are attributed too. render() produces
+    the Prometheus text format served at /metrics.
+    """
+
+    def __init__(self):
+        self.request_seconds = Histogram(
+            "http_request_duration_seconds", "HTTP request latency by route", LATENCY_BUCKETS,
+            ("method", "route", "status"),
+        )
+        self.request_statements = Histogram(
+            "http_request_db_statements", "SQL statements per HTTP request", STATEMENT_BUCKETS, ("method", "route"),
+        )
+        self.request_db_seconds = Histogram(
+            "http_request_db_seconds", "Database time per HTTP request", LATENCY_BUCKETS, ("method", "route"),
+        )
+        self.operation_seconds = Histogram(
+            "warehouse_operation_duration_seconds", "Duration of background and bulk operations", LATENCY_BUCKETS,
+            ("operation",),
+        )
+        self.operation_statements = Histogram(
+            "warehouse_operation_db_statements", "SQL statements per operation", STATEMENT_BUCKETS, ("operation",),
+        )
+        self.db_statements_total = Counter("db_statements_total", "SQL statements executed", ("scope",))
+        self.db_seconds_total = Counter("db_seconds_total", "Time spent executing SQL", ("scope",))
+        self._instrumented = set()
+
+    def instrument_engine(self, engine):
+        if id(engine) in self._instrumented:
+            return
+        self._instrumented.add(id(engine))
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+        scope = (stats.scope if stats is not None else "other",)
+        self.db_statements_total.inc(scope)
+        self.db_seconds_total.inc(scope, elapsed)
+
+    @contextmanager
+    def track(self, operation: str):
+        """Time an operation and count its statements; nested ones also count towards the caller."""
+        parent = _current_stats.get()
+        stats = QueryStats("operation")
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            _current_stats.reset(token)
+            self.operation_seconds.observe((operation,), time.perf_counter() - started)
+            self.operation_statements.observe((operation,), stats.statements)
+            if parent is not None:
+                parent.statements += stats.statements
+                parent.db_seconds += stats.db_seconds
+
+    def render(self) -> str:
+        lines = []
+        for metric in (self.request_seconds, self.request_statements, self.request_db_seconds,
+                       self.operation_seconds, self.operation_statements,
+                       self.db_statements_total, self.db_seconds_total):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and SQL statements per route, and profiling slow requests."""
+
+    def __init__(self, app):
+        self.app = app
+        # endpoint function -> route template, filled on first use
+        self._routes: Dict[object, str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = QueryStats("request")
+        token = _current_stats.set(stats)
+        status = {'code': 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status['code'] = message["status"]
+            await send(message)
+
+        profile = profiler.begin()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_stats.reset(token)
+            method = scope["method"]
+            route = self._route(scope)
+            metrics.request_seconds.observe((method, route, str(status['code'])), elapsed)
+            metrics.request_statements.observe((method, route), stats.statements)
+            metrics.request_db_seconds.observe((method, route), stats.db_seconds)
+            if profile is not None:
+                profiler.end(profile, method, scope["path"], elapsed, stats.statements)
+
+    def _route(self, scope) -> str:
+        # The router stores the matched endpoint in the scope; 404s have none
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        route = self._routes.get(endpoint)
+        if route is None:
+            app = scope.get("app")
+            for candidate in getattr(app, "routes", []):
+                if getattr(candidate, "endpoint", None) is endpoint:
+                    route = candidate.path
+                    break
+            else:
+                route = getattr(endpoint, "__name__", "unknown")
+            self._routes[endpoint] = route
+        return route
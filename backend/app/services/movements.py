@@ -0,0 +1,229 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import false, func, insert, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.item import InventoryMovement, InventoryRollup, ProductInventory, RollupWatermark
+from app.services.arrangement import WarehouseArranger
+
+ROLLUP_COUNTERS = ("received", "picked", "adjusted", "stockouts", "events")
+# A write to the watermark row: takes the row lock on MySQL, the write lock on SQLite
+WATERMARK_LOCK = text("UPDATE rollup_watermark SET last_movement_id = last_movement_id WHERE id = 1")
+
+class MovementLog:
+    """
+    Append-only inventory movement log and the rollups built from it.
+
+    Writers only append movements inside their own transaction. fold() then
+    adds every movement not folded yet to the hourly and daily buckets of
+    its SKU, category and zone, so analytics read a handful of buckets
+    instead of raw events or the live inventory.
+    """
+    BUCKETS = ("hour", "day")
+    SCOPES = ("sku", "category", "zone")
+    FOLD_BATCH_SIZE = 5000
+
+    @staticmethod
+    def record(db: Session, movements: List[dict]):
+        """
+        Append movements; the caller commits them with the write itself.
+
+        Each movement has ProductID, Category, kind (create, receive, adjust
+        or pick), quantity_delta and quantity_after.
+        """
+        statement = MovementLog.insert_statement(movements)
+        if statement is not None:
+            db.execute(statement)
+
+    @staticmethod
+    def insert_statement(movements: List[dict]):
+        """The INSERT record() executes (None if nothing moved), for async sessions."""
+        movements = [m for m in movements if m['quantity_delta']]
+        if not movements:
+            return None
+        now = datetime.utcnow()
+        return insert(InventoryMovement.__table__).values([
+            {
+                'ProductID': m['ProductID'],
+                'Category': m['Category'],
+                'Zone': WarehouseArranger.get_zone(m['Category'] or ""),
+                'kind': m['kind'],
+                'quantity_delta': m['quantity_delta'],
+                'quantity_after': m['quantity_after'],
+                'created_at': now,
+            }
+            for m in movements
+        ])
+
+    @staticmethod
+    def bucket_start(timestamp: datetime, bucket: str) -> datetime:
+        if bucket == "hour":
+            return timestamp.replace(minute=0, second=0, microsecond=0)
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def ensure_watermark(db: Session):
+        """Create the watermark row fold() locks; a concurrent creator may win the race."""
+        if db.query(RollupWatermark.id).filter(RollupWatermark.id == 1).first() is not None:
+            return
+        try:
+            db.execute(insert(RollupWatermark.__table__).values(id=1, last_movement_id=0))
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+
+    @staticmethod
+    def fold(db: Session) -> int:
+        """
+        Fold movements not yet in the rollups into them; returns how many.
+
+        Folded movements are flagged rather than tracked by id: ids are
+        assigned at INSERT, not at commit, so a writer can commit a lower id
+        after a higher one was folded. Folds lock the watermark row first,
+        in a fresh transaction, so each sees what the previous one flagged.
+
+        The fold runs in a session of its own on db's engine and leaves the
+        caller's transaction alone; read the rollups from a transaction
+        begun after it to see what it folded.
+        """
+        session = Session(bind=db.get_bind())
+        try:
+            return MovementLog._fold(session)
+        finally:
+            session.close()
+
+    @staticmethod
+    def _fold(db: Session) -> int:
+        if db.execute(WATERMARK_LOCK).rowcount == 0:
+            MovementLog.ensure_watermark(db)
+            db.execute(WATERMARK_LOCK)
+        watermark = db.query(RollupWatermark).filter(RollupWatermark.id == 1).one()
+        folded = 0
+        while True:
+            movements = db.query(
+                InventoryMovement.id,
+                InventoryMovement.ProductID,
+                InventoryMovement.Category,
+                InventoryMovement.Zone,
+                InventoryMovement.kind,
+                InventoryMovement.quantity_delta,
+                InventoryMovement.quantity_after,
+                InventoryMovement.created_at,
+            ).filter(InventoryMovement.folded == false()).order_by(
+                InventoryMovement.id
+            ).limit(MovementLog.FOLD_BATCH_SIZE).all()
+            if not movements:
+                break
+            MovementLog._add_to_rollups(db, MovementLog._totals(movements))
+            db.execute(
+                update(InventoryMovement.__table__)
+                .where(InventoryMovement.id.in_([m.id for m in movements]))
+                .values(folded=True)
+            )
+            watermark.last_movement_id = max(watermark.last_movement_id or 0, movements[-1].id)
+            folded += len(movements)
+        db.commit()
+        return folded
+
+    @staticmethod
+    def _totals(movements) -> Dict[tuple, dict]:
+        totals = {}
+        for m in movements:
+            delta = m.quantity_delta
+            for bucket in MovementLog.BUCKETS:
+                start = MovementLog.bucket_start(m.created_at, bucket)
+                for scope, key in (("sku", m.ProductID), ("category", m.Category or ""), ("zone", m.Zone or "")):
+                    t = totals.get((bucket, start, scope, key))
+                    if t is None:
+                        t = totals[(bucket, start, scope, key)] = dict.fromkeys(ROLLUP_COUNTERS, 0)
+                    if m.kind in ("create", "receive"):
+                        t['received'] += delta
+                    elif m.kind == "pick":
+                        t['picked'] -= delta
+                    else:
+                        t['adjusted'] += delta
+                    if delta < 0 and m.quantity_after == 0:
+                        t['stockouts'] += 1
+                    t['events'] += 1
+        return totals
+
+    @staticmethod
+    def _add_to_rollups(db: Session, totals: Dict[tuple, dict]):
+        starts = {start for _, start, _, _ in totals}
+        existing = {
+            (r.bucket, r.bucket_start, r.scope, r.key): r.id
+            for r in db.query(
+                InventoryRollup.id, InventoryRollup.bucket, InventoryRollup.bucket_start,
+                InventoryRollup.scope, InventoryRollup.key,
+            ).filter(InventoryRollup.bucket_start.in_(starts))
+            if (r.bucket, r.bucket_start, r.scope, r.key) in totals
+        }
+        updates = [{'id': existing[k], **t} for k, t in totals.items() if k in existing]
+        inserts = [
+            {'bucket': k[0], 'bucket_start': k[1], 'scope': k[2], 'key': k[3], **t}
+            for k, t in totals.items() if k not in existing
+        ]
+        if updates:
+            db.execute(text(
+                "UPDATE inventory_rollup SET received = received + :received, picked = picked + :picked, "
+                "adjusted = adjusted + :adjusted, stockouts = stockouts + :stockouts, events = events + :events "
+                "WHERE id = :id"
+            ), updates)
+        if inserts:
+            db.execute(insert(InventoryRollup.__table__).values(inserts))
+
+    @staticmethod
+    def series(db: Session, scope: str, bucket: str, key: Optional[str] = None,
+               since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[dict]:
+        """Rollup buckets in time order, folding any new movements first."""
+        MovementLog.fold(db)
+        query = db.query(InventoryRollup).filter(InventoryRollup.bucket == bucket, InventoryRollup.scope == scope)
+        if key is not None:
+            query = query.filter(InventoryRollup.key == key)
+        if since is not None:
+            query = query.filter(InventoryRollup.bucket_start >= MovementLog.bucket_start(since, bucket))
+        if until is not None:
+            query = query.filter(InventoryRollup.bucket_start <= until)
+        return [
+            {
+                'bucket_start': r.bucket_start,
+                'key': r.key,
+                **{c: getattr(r, c) for c in ROLLUP_COUNTERS},
+                'net_change': r.received - r.picked + r.adjusted,
+            }
+            for r in query.order_by(InventoryRollup.bucket_start, InventoryRollup.key)
+        ]
+
+    @staticmethod
+    def levels(db: Session, scope: str, key: str, bucket: str, since: Optional[datetime] = None) -> List[dict]:
+        """Stock level at the end of each bucket, walked back from the current total."""
+        buckets = MovementLog.series(db, scope, bucket, key=key, since=since)
+        query = db.query(func.coalesce(func.sum(ProductInventory.Quantity), 0))
+        if scope == "sku":
+            query = query.filter(ProductInventory.ProductID == key)
+        elif scope == "category":
+            query = query.filter(ProductInventory.Category == key)
+        else:
+            query = query.filter(ProductInventory.Zone == key)
+        level = query.scalar()
+        levels = []
+        for b in reversed(buckets):
+            levels.append({'bucket_start': b['bucket_start'], 'key': key, 'quantity': level})
+            level -= b['net_change']
+        return list(reversed(levels))
+
+    @staticmethod
+    def totals_by_key(db: Session, scope: str, bucket: str, since: Optional[datetime] = None) -> List[dict]:
+        """Counters summed over the selected buckets, one entry per key."""
+        MovementLog.fold(db)
+        query = db.query(
+            InventoryRollup.key, *[func.sum(getattr(InventoryRollup, c)).label(c) for c in ROLLUP_COUNTERS]
+        ).filter(InventoryRollup.bucket == bucket, InventoryRollup.scope == scope)
+        if since is not None:
+            query = query.filter(InventoryRollup.bucket_start >= MovementLog.bucket_start(since, bucket))
+        return [
+            {'key': r.key, **{c: int(getattr(r, c) or 0) for c in ROLLUP_COUNTERS}}
+            for r in query.group_by(InventoryRollup.key).order_by(InventoryRollup.key)
+        ]
@@ -0,0 +1,141 @@
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.models.item import ProductInventory, RackPlacement
+from app.services.movements import MovementLog
+
+class Picker:
+    """
+    Stock retrieval that is safe under concurrent pickers.
+
+    Each line is a conditional decrement in the database, so a line only
+    succeeds if the stock is still there when the UPDATE runs. The space a
+    pick releases is taken from the SKU's own last racks, locked row by row;
+    no other SKU moves. No process-wide lock is taken, so picks run
+    alongside rearrangements (and across workers); a transaction the
+    database aborts on a lock conflict is retried.
+    """
+    RETRIES = 3
+    # MySQL deadlock and lock wait timeout
+    LOCK_CONFLICT_CODES = (1213, 1205)
+
+    @staticmethod
+    def pick(db: Session, lines: List[dict]):
+        """
+        Pick `lines` ({'ProductID', 'quantity'}) in one short transaction.
+
+        Returns (results, changed): one result per line, in order, with the
+        remaining Quantity or the reason the line was refused, and a
+        (row, DemandPastMonth before the pick) pair per product that changed.
+        """
+        for attempt in range(Picker.RETRIES):
+            try:
+                return Picker._pick(db, lines)
+            except OperationalError as e:
+                db.rollback()
+                if attempt == Picker.RETRIES - 1 or not Picker._lock_conflict(e):
+                    raise
+
+    @staticmethod
+    def _lock_conflict(error: OperationalError) -> bool:
+        args = getattr(error.orig, "args", ())
+        return (bool(args) and args[0] in Picker.LOCK_CONFLICT_CODES) or "database is locked" in str(error.orig)
+
+    @staticmethod
+    def _pick(db: Session, lines: List[dict]):
+        results = []
+        picked: Dict[str, int] = {}
+        for line in lines:
+            product_id, quantity = line['ProductID'], line['quantity']
+            # TotalWeight_kg first: MySQL applies SET assignments left to right
+            updated = db.execute(text(
+                "UPDATE product_inventory SET TotalWeight_kg = (Quantity - :quantity) * IndividualWeight_kg, "
+                "DemandPastMonth = DemandPastMonth + :quantity, Quantity = Quantity - :quantity "
+                "WHERE ProductID = :product_id AND Quantity >= :quantity"
+            ), {'product_id': product_id, 'quantity': quantity}).rowcount
+            results.append({'ProductID': product_id, 'requested': quantity, 'picked': bool(updated)})
+            if updated:
+                picked[product_id] = picked.get(product_id, 0) + quantity
+
+        rows = {
+            row.ProductID: row
+            for row in db.query(
+                ProductInventory.ProductID,
+                ProductInventory.ProductName,
+                ProductInventory.Category,
+                ProductInventory.Quantity,
+                ProductInventory.DemandPastMonth,
+                ProductInventory.IndividualWeight_kg,
+            ).filter(ProductInventory.ProductID.in_({r['ProductID'] for r in results}))
+        }
+        for product_id, units in picked.items():
+            row = rows[product_id]
+            Picker.free_last_racks(db, product_id, row.IndividualWeight_kg, units, row.Quantity + units)
+        MovementLog.record(db, [
+            {
+                'ProductID': product_id, 'Category': rows[product_id].Category, 'kind': 'pick',
+                'quantity_delta': -units, 'quantity_after': rows[product_id].Quantity,
+            }
+            for product_id, units in picked.items()
+        ])
+        db.commit()
+
+        for result in results:
+            row = rows.get(result['ProductID'])
+            if row is None:
+                result['error'] = f"Product {result['ProductID']} not found"
+            elif not result['picked']:
+                result['error'] = "Not enough quantity in stock"
+            result['Quantity'] = row.Quantity if row is not None else None
+        changed = [(rows[pid], rows[pid].DemandPastMonth - units) for pid, units in picked.items()]
+        return results, changed
+
+    @staticmethod
+    def free_last_racks(db: Session, product_id: str, unit_weight: float, units: int, previous_quantity: int):
+        """
+        Release `units` of a product from the end of its placement.
+
+        Units that never fitted on a rack are the tail of the placement, so
+        they are released first. The product's ShelfLocation/RackLocation are
+        rebuilt from the racks it still holds.
+        """
+        placements = db.query(RackPlacement).filter(RackPlacement.ProductID == product_id).order_by(
+            RackPlacement.zone.desc(), RackPlacement.shelf.desc(), RackPlacement.rack.desc()
+        ).with_for_update().all()
+        if not placements:
+            return
+        unplaced = previous_quantity - sum(p.quantity for p in placements)
+        remaining = units - max(unplaced, 0)
+        rack_updates = []
+        for placement in placements:
+            if remaining <= 0:
+                break
+            take = min(placement.quantity, remaining)
+            rack_updates.append({
+                'zone': placement.zone, 'shelf': placement.shelf, 'rack': placement.rack,
+                'weight': take * unit_weight,
+            })
+            if take == placement.quantity:
+                db.delete(placement)
+            else:
+                placement.quantity -= take
+                placement.weight = placement.quantity * unit_weight
+            remaining -= take
+        if not rack_updates:
+            return
+        db.execute(text(
+            "UPDATE rack_capacity SET used_weight = used_weight - :weight "
+            "WHERE zone = :zone AND shelf = :shelf AND rack = :rack"
+        ), rack_updates)
+        kept = [p for p in reversed(placements) if p.quantity > 0 and p not in db.deleted]
+        db.execute(text(
+            "UPDATE product_inventory SET ShelfLocation = :shelf_location, RackLocation = :rack_location "
+            "WHERE ProductID = :product_id"
+        ), {
+            'product_id': product_id,
+            'shelf_location': ','.join(f"{p.zone}{p.shelf}" for p in kept),
+            'rack_location': ','.join(str(p.rack) for p in kept),
+        })
@@ -0,0 +1,170 @@
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.item import RackPlacement
+from app.services.arrangement import WarehouseArranger
+
+class PickListPlanner:
+    """
+    Order-level pick lists: slots, waves and walking routes.
+
+    Lines are allocated to racks in the order Picker releases stock (a SKU's
+    last racks first), so the list matches what a later POST /inventory/pick
+    books. Orders are grouped into waves by where their racks lie along the
+    serpentine walk, and each wave becomes one route from the dock and back:
+    zone by zone, up one shelf and down the next, then improved with 2-opt.
+    Distances are rectilinear over the layout's rack positions.
+    """
+    # 2-opt is quadratic per pass; longer routes keep the serpentine order
+    MAX_TWO_OPT_STOPS = 400
+    MAX_TWO_OPT_PASSES = 20
+
+    @staticmethod
+    def plan(db: Session, orders: List[dict], wave_size: int) -> dict:
+        """
+        `orders` are {'order_id', 'lines': [{'ProductID', 'quantity'}]}.
+
+        Returns the waves with their routes, the lines that could not be
+        (fully) allocated, and the distance against one route per order.
+        """
+        stock = PickListPlanner._stock(db, {line['ProductID'] for o in orders for line in o['lines']})
+        # order_id -> {(zone, slot): [allocation]}
+        order_stops: Dict[str, Dict[tuple, list]] = {}
+        unfulfilled = []
+        for order in orders:
+            stops = order_stops.setdefault(order['order_id'], {})
+            for line in order['lines']:
+                missing = PickListPlanner._allocate(stock, order['order_id'], line, stops)
+                if missing:
+                    unfulfilled.append({
+                        'order_id': order['order_id'], 'ProductID': line['ProductID'],
+                        'requested': line['quantity'], 'missing': missing,
+                    })
+
+        routable = [order_id for order_id, stops in order_stops.items() if stops]
+        separate = {order_id: PickListPlanner.route(list(order_stops[order_id]))[1] for order_id in routable}
+        # Neighbouring orders along the walk share a wave
+        routable.sort(key=lambda order_id: PickListPlanner._centre(order_stops[order_id]))
+
+        waves = []
+        for start in range(0, len(routable), wave_size):
+            wave_orders = routable[start:start + wave_size]
+            merged: Dict[tuple, list] = {}
+            for order_id in wave_orders:
+                for stop, allocations in order_stops[order_id].items():
+                    merged.setdefault(stop, []).extend(allocations)
+            route, distance = PickListPlanner.route(list(merged))
+            separate_distance = sum(separate[order_id] for order_id in wave_orders)
+            waves.append({
+                'wave': len(waves) + 1,
+                'order_ids': wave_orders,
+                'stops': [PickListPlanner._stop(stop, merged[stop]) for stop in route],
+                'distance_m': round(distance, 3),
+                'separate_distance_m': round(separate_distance, 3),
+            })
+
+        total = sum(w['distance_m'] for w in waves)
+        separate_total = sum(separate.values())
+        return {
+            'waves': waves,
+            'unfulfilled': unfulfilled,
+            'distance_m': round(total, 3),
+            'separate_distance_m': round(separate_total, 3),
+            'distance_saved_m': round(separate_total - total, 3),
+        }
+
+    @staticmethod
+    def _stock(db: Session, product_ids) -> Dict[str, list]:
+        """Placed units per product as [[zone, slot, units]], in release order."""
+        layout = WarehouseArranger.layout
+        stock = {}
+        rows = db.query(
+            RackPlacement.ProductID, RackPlacement.zone, RackPlacement.shelf, RackPlacement.rack, RackPlacement.quantity
+        ).filter(RackPlacement.ProductID.in_(product_ids)).order_by(
+            RackPlacement.zone.desc(), RackPlacement.shelf.desc(), RackPlacement.rack.desc()
+        )
+        for product_id, zone, shelf, rack, quantity in rows:
+            zone_layout = layout.zones.get(zone)
+            if zone_layout is not None and zone_layout.has_rack(shelf, rack) and quantity > 0:
+                stock.setdefault(product_id, []).append([zone, zone_layout.slot(shelf, rack), quantity])
+        return stock
+
+    @staticmethod
+    def _allocate(stock: dict, order_id: str, line: dict, stops: dict) -> int:
+        """Take a line's units from the product's racks; returns the units short."""
+        remaining = line['quantity']
+        for entry in stock.get(line['ProductID'], []):
+            if remaining <= 0:
+                break
+            zone, slot, available = entry
+            take = min(available, remaining)
+            if take <= 0:
+                continue
+            entry[2] -= take
+            remaining -= take
+            stops.setdefault((zone, slot), []).append(
+                {'order_id': order_id, 'ProductID': line['ProductID'], 'quantity': take}
+            )
+        return remaining
+
+    @staticmethod
+    def _walk_rank(stop: tuple) -> tuple:
+        # Zone by zone, racks ascending on odd shelves and descending on even ones
+        zone, slot = stop
+        zone_layout = WarehouseArranger.layout.zones[zone]
+        shelf, rack = zone_layout.location(slot)
+        return zone_layout.xs[slot], shelf, rack if shelf % 2 else -rack
+
+    @staticmethod
+    def _centre(stops) -> tuple:
+        zones = WarehouseArranger.layout.zones
+        return (float(np.mean([zones[z].xs[s] for z, s in stops])),
+                float(np.mean([zones[z].ys[s] for z, s in stops])))
+
+    @staticmethod
+    def _stop(stop: tuple, allocations: list) -> dict:
+        zone, slot = stop
+        shelf, rack = WarehouseArranger.layout.zones[zone].location(slot)
+        return {'zone': zone, 'shelf': shelf, 'rack': rack, 'picks': allocations}
+
+    @staticmethod
+    def route(stops: List[tuple]):
+        """Visiting order of (zone, slot) stops from the dock and back, and its length."""
+        if not stops:
+            return [], 0.0
+        stops = sorted(stops, key=PickListPlanner._walk_rank)
+        zones = WarehouseArranger.layout.zones
+        # Dock, stops, dock
+        xs = np.array([0.0] + [zones[z].xs[s] for z, s in stops] + [0.0])
+        ys = np.array([0.0] + [zones[z].ys[s] for z, s in stops] + [0.0])
+        order = np.arange(len(xs))
+        if len(stops) <= PickListPlanner.MAX_TWO_OPT_STOPS:
+            order = PickListPlanner._two_opt(xs, ys, order)
+        path_x, path_y = xs[order], ys[order]
+        distance = float(np.abs(np.diff(path_x)).sum() + np.abs(np.diff(path_y)).sum())
+        return [stops[i - 1] for i in order[1:-1]], distance
+
+    @staticmethod
+    def _two_opt(xs, ys, order):
+        """Reverse route segments while that shortens the tour; endpoints stay fixed."""
+        n = len(order)
+        if n < 5:
+            return order
+        dist = np.abs(xs[:, None] - xs[None, :]) + np.abs(ys[:, None] - ys[None, :])
+        for _ in range(PickListPlanner.MAX_TWO_OPT_PASSES):
+            improved = False
+            for i in range(1, n - 2):
+                a, b = order[i - 1], order[i]
+                c = order[i + 1:n - 1]
+                d = order[i + 2:n]
+                # Gain of reversing order[i..j] for every j > i
+                delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+                j = int(np.argmin(delta))
+                if delta[j] < -1e-9:
+                    order[i:i + j + 2] = order[i:i + j + 2][::-1].copy()
+                    improved = True
+            if not improved:
+                break
+        return order
@@ -0,0 +1,114 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import List, Optional
+
+from app.config import PROFILE_SAMPLE_INTERVAL_MS, PROFILE_SLOW_REQUESTS_MS
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(APP_DIR, "api")
+
+class SlowRequestProfiler:
+    """
+    Opt-in sampling profiler that keeps profiles of slow requests only.
+
+    While at least one request is in flight, a sampler thread takes the
+    stack of every thread running application code each interval. When a
+    request finishes over the threshold, the stacks sampled during it are
+    kept as folded stacks ("outer;inner count", the flame graph input
+    format). Requests running concurrently share the samples of that time.
+    A threshold of 0 turns profiling off and costs nothing per request.
+    """
+    MAX_PROFILES = 20
+    MAX_STACKS = 50
+
+    def __init__(self, threshold_ms: float = PROFILE_SLOW_REQUESTS_MS,
+                 interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS):
+        self.threshold_ms = threshold_ms
+        self.interval_ms = interval_ms
+        self._lock = threading.Lock()
+        # id -> sample counter of each request in flight
+        self._requests = {}
+        self._thread = None
+        self.profiles = deque(maxlen=self.MAX_PROFILES)
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def configure(self, threshold_ms: float, interval_ms: Optional[float] = None):
+        self.threshold_ms = threshold_ms
+        if interval_ms is not None:
+            self.interval_ms = interval_ms
+
+    def begin(self) -> Optional[Counter]:
+        """Start collecting samples for a request; None when profiling is off."""
+        if not self.enabled:
+            return None
+        samples = Counter()
+        with self._lock:
+            self._requests[id(samples)] = samples
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample, name="request-profiler", daemon=True)
+                self._thread.start()
+        return samples
+
+    def end(self, samples: Counter, method: str, path: str, elapsed: float, statements: int):
+        with self._lock:
+            self._requests.pop(id(samples), None)
+        if elapsed * 1000 < self.threshold_ms:
+            return
+        self.profiles.append({
+            'method': method,
+            'path': path,
+            'duration_ms': round(elapsed * 1000, 3),
+            'statements': statements,
+            'captured_at': datetime.utcnow().isoformat(),
+            'samples': sum(samples.values()),
+            'interval_ms': self.interval_ms,
+            'stacks': [f"{stack} {count}" for stack, count in samples.most_common(self.MAX_STACKS)],
+        })
+
+    def recent(self) -> List[dict]:
+        return list(reversed(self.profiles))
+
+    def _sample(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._requests:
+                    self._thread = None
+                    return
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = self._fold(frame)
+                if stack is not None:
+                    stacks.append(stack)
+            # Under the lock, so a finished request's samples no longer change
+            with self._lock:
+                for samples in self._requests.values():
+                    samples.update(stacks)
+            time.sleep(self.interval_ms / 1000)
+
+    @staticmethod
+    def _fold(frame) -> Optional[str]:
+        # Idle background threads (blocked in threading outside any request) are skipped
+        idle = frame.f_code.co_filename == threading.__file__
+        names = []
+        in_app = in_request = False
+        while frame is not None:
+            code = frame.f_code
+            in_app = in_app or code.co_filename.startswith(APP_DIR)
+            in_request = in_request or code.co_filename.startswith(API_DIR)
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        if not in_app or (idle and not in_request):
+            return None
+        return ";".join(reversed(names))
+
+profiler = SlowRequestProfiler()
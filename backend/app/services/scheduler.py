@@ -0,0 +1,357 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from app.config import ARRANGEMENT_DEBOUNCE_SECONDS, SNAPSHOT_BEFORE_REARRANGE
+from app.database import SessionLocal
+from app.services.arrangement import WarehouseArranger
+from app.services.cache import response_cache
+from app.services.metrics import metrics
+from app.services.slotting import FIRST_FIT, SLOTTING, STRATEGIES, SlottingOptimizer
+from app.services.snapshots import AUTO_PREFIX, WarehouseSnapshot
+
+logger = logging.getLogger(__name__)
+
+class ArrangementScheduler:
+    """
+    Runs rearrangements in a background thread instead of inside requests.
+
+    Writes mark their zone dirty and get a generation number back. Each zone
+    is rearranged once per debounce window, however many writes hit it, and a
+    generation counts as completed once its zone has been rearranged after
+    it, whatever other zones are still pending.
+
+    Zones are re-placed with the strategy of the last full rearrangement:
+    first-fit incrementally, slotting by re-slotting the whole zone. A zone
+    whose rearrangement fails stays pending and is retried with backoff, so
+    its generations do not complete (writers waiting on that zone time out)
+    and status() reports the failure until a retry succeeds.
+    """
+    RETRY_SECONDS = 1.0
+    MAX_RETRY_SECONDS = 60.0
+
+    def __init__(self, window: float = ARRANGEMENT_DEBOUNCE_SECONDS, session_factory=SessionLocal):
+        self.window = window
+        self.session_factory = session_factory
+        self._cond = threading.Condition()
+        # Serializes rearrangements and restores against each other; picks
+        # never take it (see pick_token)
+        self.arrange_lock = threading.Lock()
+        # zone -> {'changes': {ProductID: previous demand}, 'first_generation',
+        #          'generations': [...], 'deadline'}
+        self._pending = {}
+        # generation -> zone it marked dirty, until that zone's batch completes
+        self._generation_zones = {}
+        # zone -> first generation of the batch currently being rearranged
+        self._running = {}
+        # zone -> {ProductID: previous demand} for writes patched in place
+        self._deferred = {}
+        self._generation = 0
+        # Bumped by each restore; zone batches taken before it are dropped
+        self._restores = 0
+        # Rearrangements started so far and full ones in progress, so a pick
+        # can tell whether one overlapped it
+        self._started = 0
+        self._full_running = 0
+        # zone -> {'attempts', 'error', 'failed_at'} of zones waiting for a retry
+        self._failures = {}
+        # (generation, loop, future) of coroutines waiting in wait_for_async
+        self._async_waiters = []
+        self.strategy = FIRST_FIT
+        self._last_completed_at = None
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="arrangement-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Flush pending zones and stop the worker."""
+        with self._cond:
+            thread = self._thread
+            self._stopping = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join()
+        self._thread = None
+
+    def mark_dirty(self, zone: str, product_id: str, previous_demand: Optional[int] = None) -> int:
+        """Schedule `zone` for rearrangement and return the write's generation."""
+        with self._cond:
+            self._generation += 1
+            entry = self._pending.get(zone)
+            if entry is None:
+                entry = self._pending[zone] = {
+                    'changes': self._deferred.pop(zone, {}),
+                    'first_generation': self._generation,
+                    'generations': [],
+                    'deadline': time.monotonic() + self.window,
+                }
+                self._cond.notify_all()
+            # Keep the demand from before the first write in the window
+            entry['changes'].setdefault(product_id, previous_demand)
+            entry['generations'].append(self._generation)
+            self._generation_zones[self._generation] = zone
+            return self._generation
+
+    def defer(self, zone: str, product_id: str, previous_demand: Optional[int] = None):
+        """
+        Record a write whose placement was already patched in place.
+
+        No rearrangement is scheduled for it, but the zone's next one starts
+        no later than this product's rank.
+        """
+        with self._cond:
+            entry = self._pending.get(zone)
+            changes = entry['changes'] if entry is not None else self._deferred.setdefault(zone, {})
+            changes.setdefault(product_id, previous_demand)
+
+    def pick_token(self) -> tuple:
+        """Taken before a pick starts and handed back to after_pick."""
+        with self._cond:
+            return self._started, bool(self._running) or self._full_running > 0
+
+    def after_pick(self, token: tuple, zone: str, product_id: str, previous_demand: Optional[int] = None) -> int:
+        """
+        Account for a committed pick, which freed its racks in place; returns
+        the generation its placement is final at.
+
+        Picks do not wait for rearrangements. One that overlapped the pick
+        may have placed the quantity from before it, so then the zone is
+        rearranged again; otherwise the pick is only deferred, and a
+        generation that is already completed is returned.
+        """
+        started, busy = token
+        with self._cond:
+            if busy or started != self._started or self._running or self._full_running:
+                return self.mark_dirty(zone, product_id, previous_demand)
+            self.defer(zone, product_id, previous_demand)
+            return self._completed_generation()
+
+    @property
+    def completed_generation(self) -> int:
+        with self._cond:
+            return self._completed_generation()
+
+    def _completed_generation(self) -> int:
+        # Every generation up to this one is completed, in all zones
+        outstanding = [e['first_generation'] for e in self._pending.values()] + list(self._running.values())
+        return min(outstanding) - 1 if outstanding else self._generation
+
+    def _is_completed(self, generation: int) -> bool:
+        # Only the zone the generation marked dirty has to be rearranged
+        if generation > self._generation:
+            return False
+        zone = self._generation_zones.get(generation)
+        if zone is None:
+            return True
+        entry = self._pending.get(zone)
+        if entry is not None and entry['first_generation'] <= generation:
+            return False
+        running = self._running.get(zone)
+        return running is None or running > generation
+
+    def status(self) -> dict:
+        with self._cond:
+            return {
+                'generation': self._generation,
+                'completed_generation': self._completed_generation(),
+                'pending_zones': sorted(set(self._pending) | set(self._running)),
+                'strategy': self.strategy,
+                'last_completed_at': self._last_completed_at.isoformat() if self._last_completed_at else None,
+                'failed_zones': {zone: dict(failure) for zone, failure in sorted(self._failures.items())},
+            }
+
+    def timeout_detail(self, generation: int) -> str:
+        """Error detail for a wait on `generation` that timed out, naming zones stuck retrying."""
+        with self._cond:
+            failed = ", ".join(f"{zone} ({f['error']})" for zone, f in sorted(self._failures.items()))
+        detail = f"Rearrangement {generation} did not complete in time"
+        return f"{detail}; failing zones: {failed}" if failed else detail
+
+    def wait_for(self, generation: int, timeout: Optional[float] = None) -> bool:
+        """Block until `generation` has been rearranged; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._is_completed(generation), timeout)
+
+    async def wait_for_async(self, generation: int, timeout: Optional[float] = None) -> bool:
+        """wait_for for the event loop: suspends the coroutine instead of blocking a thread."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (generation, loop, future)
+        with self._cond:
+            if self._is_completed(generation):
+                return True
+            self._async_waiters.append(waiter)
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._cond:
+                if waiter in self._async_waiters:
+                    self._async_waiters.remove(waiter)
+
+    def _wake_async_waiters(self):
+        # Called with _cond held, from the worker thread
+        for waiter in [w for w in self._async_waiters if self._is_completed(w[0])]:
+            self._async_waiters.remove(waiter)
+            _, loop, future = waiter
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_resolve, future)
+
+    def rearrange_all(self, db, strategy: str = FIRST_FIT) -> dict:
+        """
+        Full synchronous rearrangement, serialized with the background work.
+
+        Returns the layout cost before and after (see SlottingOptimizer.evaluate).
+        """
+        with self.arrange_lock:
+            with self._cond:
+                self._deferred.clear()
+                self._started += 1
+                self._full_running += 1
+            try:
+                if SNAPSHOT_BEFORE_REARRANGE:
+                    # Lets a bad rearrangement be rolled back
+                    WarehouseSnapshot.save(db, prefix=AUTO_PREFIX, strategy=self.strategy)
+                    WarehouseSnapshot.prune()
+                before = SlottingOptimizer.evaluate_current(db)
+                with metrics.track(f"rearrange_inventory_{strategy}"):
+                    if strategy == SLOTTING:
+                        SlottingOptimizer.rearrange_inventory(db)
+                    else:
+                        WarehouseArranger.rearrange_inventory(db)
+                after = SlottingOptimizer.evaluate_current(db)
+                self.strategy = strategy
+            finally:
+                with self._cond:
+                    self._full_running -= 1
+        response_cache.bump()
+        with self._cond:
+            self._last_completed_at = datetime.utcnow()
+        return {'before': before, 'after': after}
+
+    def restore(self, db, lines) -> dict:
+        """
+        Replace the warehouse state with a snapshot (see WarehouseSnapshot.restore).
+
+        Zone rearrangements scheduled before it are dropped rather than run
+        over the restored layout, and their generations count as completed.
+        The strategy the snapshot was taken under is applied to later ones.
+        """
+        with self.arrange_lock:
+            report = WarehouseSnapshot.restore(db, lines)
+            with self._cond:
+                self._restores += 1
+                for entry in self._pending.values():
+                    self._forget(entry)
+                self._pending.clear()
+                self._deferred.clear()
+                self._failures.clear()
+                self._last_completed_at = datetime.utcnow()
+                if report['strategy'] in STRATEGIES:
+                    self.strategy = report['strategy']
+                self._cond.notify_all()
+                self._wake_async_waiters()
+        return report
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    if self._stopping:
+                        due = list(self._pending)
+                    else:
+                        due = [zone for zone, entry in self._pending.items() if entry['deadline'] <= now]
+                    if due or self._stopping:
+                        break
+                    timeout = min((e['deadline'] for e in self._pending.values()), default=now + 60) - now
+                    self._cond.wait(timeout)
+                if not due:
+                    return
+                batch = {zone: self._pending.pop(zone) for zone in due}
+                restores = self._restores
+                self._started += 1
+                for zone, entry in batch.items():
+                    self._running[zone] = entry['first_generation']
+
+            for zone, entry in batch.items():
+                error = self._rearrange(zone, entry['changes'], restores)
+                with self._cond:
+                    del self._running[zone]
+                    if error is None:
+                        self._failures.pop(zone, None)
+                        self._forget(entry)
+                        self._last_completed_at = datetime.utcnow()
+                    elif self._stopping:
+                        logger.error("Dropping rearrangement of zone %s at shutdown", zone)
+                        self._forget(entry)
+                    else:
+                        self._retry(zone, entry, error)
+                    self._cond.notify_all()
+                    self._wake_async_waiters()
+
+    def _retry(self, zone: str, entry: dict, error: Exception):
+        # Called with _cond held: put the failed batch back, merged with any
+        # writes that arrived meanwhile, and back off exponentially
+        failure = self._failures.get(zone, {'attempts': 0})
+        attempts = failure['attempts'] + 1
+        self._failures[zone] = {
+            'attempts': attempts,
+            'error': f"{type(error).__name__}: {error}",
+            'failed_at': datetime.utcnow().isoformat(),
+        }
+        delay = min(self.RETRY_SECONDS * 2 ** (attempts - 1), self.MAX_RETRY_SECONDS)
+        pending = self._pending.get(zone)
+        if pending is not None:
+            # The failed batch's demands predate the newer writes
+            entry['changes'].update(
+                {pid: demand for pid, demand in pending['changes'].items() if pid not in entry['changes']}
+            )
+            entry['first_generation'] = min(entry['first_generation'], pending['first_generation'])
+            entry['generations'] += pending['generations']
+        entry['deadline'] = time.monotonic() + delay
+        self._pending[zone] = entry
+
+    def _forget(self, entry: dict):
+        # Called with _cond held, once a batch's generations are completed
+        for generation in entry['generations']:
+            self._generation_zones.pop(generation, None)
+
+    def _rearrange(self, zone: str, changes: dict, restores: int) -> Optional[Exception]:
+        """Rearrange one zone; returns the error if it failed."""
+        db = self.session_factory()
+        try:
+            with self.arrange_lock:
+                if restores != self._restores:
+                    return None
+                with metrics.track(f"rearrange_zone_{self.strategy}"):
+                    if self.strategy == SLOTTING:
+                        SlottingOptimizer.rearrange_zone(db, zone)
+                    else:
+                        WarehouseArranger.rearrange_zone_batch(db, zone, changes)
+            response_cache.bump()
+            return None
+        except Exception as e:
+            logger.exception("Rearrangement of zone %s failed", zone)
+            db.rollback()
+            return e
+        finally:
+            db.close()
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(True)
+
+scheduler = ArrangementScheduler()
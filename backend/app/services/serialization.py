@@ -0,0 +1,46 @@
+import gzip
+from typing import Dict, Optional
+
+import orjson
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from app.config import GZIP_MIN_BYTES
+
+GZIP_COMPRESSLEVEL = 5
+
+def dumps(data) -> bytes:
+    """
+    Compact JSON bytes of `data`.
+
+    Plain dicts, lists, strings and numbers are encoded directly by orjson;
+    anything else, such as Pydantic models, goes through FastAPI's
+    jsonable_encoder. NaN and infinities are written as null.
+    """
+    return orjson.dumps(data, default=jsonable_encoder,
+                        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+def compress(body: bytes) -> Optional[bytes]:
+    """Gzipped `body` if it is large enough to be worth it (GZIP_MIN_BYTES; 0 disables)."""
+    if not GZIP_MIN_BYTES or len(body) < GZIP_MIN_BYTES:
+        return None
+    return gzip.compress(body, compresslevel=GZIP_COMPRESSLEVEL, mtime=0)
+
+def accepts_gzip(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "")
+
+def json_response(request: Request, body: bytes, gzipped: Optional[bytes] = None,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """A JSON response from serialized bytes, gzipped when the client accepts it."""
+    headers = dict(headers or {})
+    if GZIP_MIN_BYTES:
+        headers["Vary"] = "Accept-Encoding"
+    if gzipped is not None and accepts_gzip(request):
+        headers["Content-Encoding"] = "gzip"
+        body = gzipped
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def fast_response(request: Request, data) -> Response:
+    """Serialize `data` without response_model validation; for uncached, already trusted data."""
+    body = dumps(data)
+    return json_response(request, body, compress(body) if accepts_gzip(request) else None)
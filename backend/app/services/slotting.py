@@ -0,0 +1,248 @@
+from typing import Dict
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.item import ProductInventory, RackPlacement
+from app.services.arrangement import WarehouseArranger
+from app.services.layout import ZoneLayout
+
+FIRST_FIT = "first-fit"
+SLOTTING = "slotting"
+STRATEGIES = (FIRST_FIT, SLOTTING)
+
+class SlottingOptimizer:
+    """
+    Pick-frequency-aware alternative to the first-fit arranger.
+
+    A layout costs, per month,
+
+        travel    sum of DemandPastMonth x distance from the dock of each SKU
+                  (averaged over its racks by quantity)
+        + SPLIT_PENALTY_M x demand of every extra rack a SKU is split over
+        + FILL_PENALTY x kg of free space left in racks that are in use
+
+    SKUs are placed in decreasing order of picks per kg stored, each into
+    the rack (best fit) that adds least to that cost, splitting over as few
+    racks as possible when none holds it whole. Relocations and swaps of
+    single-rack SKUs then run until no move lowers the cost. Zones and
+    category rules are the layout's; only racks within a zone change.
+    """
+    # Extra walking per pick for every additional rack a SKU is spread over
+    SPLIT_PENALTY_M = 2.0
+    # Cost per kg of free space in an open rack (fragmentation)
+    FILL_PENALTY = 0.1
+    MAX_IMPROVEMENT_PASSES = 3
+    EPSILON = 1e-9
+
+    @staticmethod
+    def place_zones(zone_products: dict) -> dict:
+        """Drop-in replacement for WarehouseArranger.place_zones."""
+        return WarehouseArranger.map_zones(SlottingOptimizer.place_zone, zone_products)
+
+    @staticmethod
+    def place_zone(zone_layout: ZoneLayout, products):
+        """Same contract as WarehouseArranger.place_zone for a whole zone."""
+        capacity = np.asarray(zone_layout.capacities, dtype=float)
+        distance = np.asarray(zone_layout.distances, dtype=float)
+        used = np.zeros(zone_layout.slots)
+        items = [p for p in products if p.Quantity > 0 and p.IndividualWeight_kg > 0]
+        items.sort(key=lambda p: (
+            -max(p.DemandPastMonth or 0, 0) / (p.Quantity * p.IndividualWeight_kg),
+            -(p.DemandPastMonth or 0),
+            p.ProductID,
+        ))
+
+        # ProductID -> {slot: units}
+        assignment: Dict[str, Dict[int, int]] = {}
+        for product in items:
+            demand = max(product.DemandPastMonth or 0, 0)
+            unit_weight = product.IndividualWeight_kg
+            remaining = product.Quantity
+            slots = assignment[product.ProductID] = {}
+            while remaining > 0:
+                fits = np.clip(np.floor_divide(capacity - used, unit_weight), 0, remaining).astype(int)
+                if slots:
+                    fits[list(slots)] = 0
+                candidates = np.flatnonzero(fits)
+                if candidates.size == 0:
+                    # Out of room: the rest stays unplaced, as with first-fit
+                    break
+                units = fits[candidates]
+                opened = used[candidates] <= SlottingOptimizer.EPSILON
+                slack_change = np.where(opened, capacity[candidates], 0.0) - units * unit_weight
+                cost = (demand * units / product.Quantity * distance[candidates]
+                        + SlottingOptimizer.FILL_PENALTY * slack_change)
+                whole = units == remaining
+                if whole.any():
+                    # Best fit among the racks that take the rest in one go
+                    best = candidates[whole][np.argmin(cost[whole])]
+                else:
+                    # Fewest splits: the rack taking most units, then cheapest
+                    best = candidates[np.lexsort((cost, -units))[0]]
+                placed = int(fits[best])
+                slots[int(best)] = placed
+                used[best] += placed * unit_weight
+                remaining -= placed
+
+        by_id = {p.ProductID: p for p in items}
+        SlottingOptimizer._improve(assignment, by_id, used, capacity, distance)
+
+        used = [0.0] * zone_layout.slots
+        locations = {}
+        placements = {}
+        for product_id, slots in assignment.items():
+            unit_weight = by_id[product_id].IndividualWeight_kg
+            rows = []
+            for slot in sorted(slots):
+                shelf, rack = zone_layout.location(slot)
+                used[slot] += slots[slot] * unit_weight
+                rows.append({
+                    'product_id': product_id,
+                    'zone': zone_layout.code,
+                    'shelf': shelf,
+                    'rack': rack,
+                    'quantity': slots[slot],
+                    'weight': slots[slot] * unit_weight,
+                })
+            locations[product_id] = (
+                ','.join(f"{zone_layout.code}{r['shelf']}" for r in rows),
+                ','.join(str(r['rack']) for r in rows),
+            )
+            placements[product_id] = rows
+        return used, locations, placements
+
+    @staticmethod
+    def _improve(assignment: dict, by_id: dict, used, capacity, distance):
+        """Relocate or swap single-rack SKUs while that lowers the cost."""
+        movable = [pid for pid, slots in assignment.items() if len(slots) == 1]
+        if not movable:
+            return
+        movable.sort(key=lambda pid: -(by_id[pid].DemandPastMonth or 0))
+        slot = np.array([next(iter(assignment[pid])) for pid in movable])
+        weight = np.array([by_id[pid].Quantity * by_id[pid].IndividualWeight_kg for pid in movable])
+        demand = np.array([max(by_id[pid].DemandPastMonth or 0, 0) for pid in movable], dtype=float)
+        eps = SlottingOptimizer.EPSILON
+
+        def slack(u, cap):
+            return np.where(u > eps, cap - u, 0.0)
+
+        for _ in range(SlottingOptimizer.MAX_IMPROVEMENT_PASSES):
+            improved = False
+            for a in range(len(movable)):
+                i = slot[a]
+                # Relocation to any rack with room
+                left = used[i] - weight[a]
+                source_change = slack(left, capacity[i]) - slack(used[i], capacity[i])
+                target_change = slack(used + weight[a], capacity) - slack(used, capacity)
+                relocate = (demand[a] * (distance - distance[i])
+                            + SlottingOptimizer.FILL_PENALTY * (source_change + target_change))
+                relocate[used + weight[a] > capacity + eps] = np.inf
+                relocate[i] = np.inf
+                # Swap with another single-rack SKU; both racks stay open
+                swap = (demand[a] - demand) * (distance[slot] - distance[i])
+                feasible = ((left + weight <= capacity[i] + eps)
+                            & (used[slot] - weight + weight[a] <= capacity[slot] + eps)
+                            & (slot != i))
+                swap[~feasible] = np.inf
+
+                k, b = int(np.argmin(relocate)), int(np.argmin(swap))
+                if min(relocate[k], swap[b]) >= -eps:
+                    continue
+                pid = movable[a]
+                if relocate[k] <= swap[b]:
+                    used[i] -= weight[a]
+                    used[k] += weight[a]
+                    assignment[pid] = {k: assignment[pid][i]}
+                    slot[a] = k
+                else:
+                    j, other = slot[b], movable[b]
+                    used[i] += weight[b] - weight[a]
+                    used[j] += weight[a] - weight[b]
+                    assignment[pid] = {int(j): assignment[pid][i]}
+                    assignment[other] = {int(i): assignment[other][j]}
+                    slot[a], slot[b] = j, i
+                improved = True
+            if not improved:
+                break
+
+    @staticmethod
+    def evaluate(placements_by_zone: dict, demand: dict) -> dict:
+        """
+        Cost of a layout given as {zone: {ProductID: placement rows}}.
+
+        `demand` maps ProductID to DemandPastMonth.
+        """
+        layout = WarehouseArranger.layout
+        travel = split_picks = slack = 0.0
+        split_skus = extra_racks = open_racks = 0
+        used_kg = capacity_kg = 0.0
+        for zone, placements in placements_by_zone.items():
+            zone_layout = layout.zones.get(zone)
+            if zone_layout is None:
+                continue
+            distance = np.asarray(zone_layout.distances)
+            used = np.zeros(zone_layout.slots)
+            for product_id, rows in placements.items():
+                rows = [r for r in rows if zone_layout.has_rack(r['shelf'], r['rack']) and r['quantity'] > 0]
+                if not rows:
+                    continue
+                slots = np.array([zone_layout.slot(r['shelf'], r['rack']) for r in rows])
+                quantity = np.array([r['quantity'] for r in rows], dtype=float)
+                np.add.at(used, slots, [r['weight'] for r in rows])
+                picks = max(demand.get(product_id) or 0, 0)
+                travel += picks * float(quantity @ distance[slots]) / float(quantity.sum())
+                if len(rows) > 1:
+                    split_skus += 1
+                    extra_racks += len(rows) - 1
+                    split_picks += picks * (len(rows) - 1)
+            capacity = np.asarray(zone_layout.capacities)
+            in_use = used > SlottingOptimizer.EPSILON
+            open_racks += int(in_use.sum())
+            used_kg += float(used[in_use].sum())
+            capacity_kg += float(capacity[in_use].sum())
+            slack += float(np.clip(capacity[in_use] - used[in_use], 0, None).sum())
+        return {
+            'objective': round(travel + SlottingOptimizer.SPLIT_PENALTY_M * split_picks
+                               + SlottingOptimizer.FILL_PENALTY * slack, 3),
+            'travel_m': round(travel, 3),
+            'split_skus': split_skus,
+            'extra_racks': extra_racks,
+            'open_racks': open_racks,
+            'fill_ratio': round(used_kg / capacity_kg, 4) if capacity_kg else 0.0,
+        }
+
+    @staticmethod
+    def evaluate_current(db: Session) -> dict:
+        """Cost of the layout stored in rack_placement."""
+        placements_by_zone = {}
+        for p in db.query(RackPlacement):
+            placements_by_zone.setdefault(p.zone, {}).setdefault(p.ProductID, []).append({
+                'shelf': p.shelf, 'rack': p.rack, 'quantity': p.quantity, 'weight': p.weight,
+            })
+        return SlottingOptimizer.evaluate(placements_by_zone, SlottingOptimizer._demand(db))
+
+    @staticmethod
+    def evaluate_plan(db: Session, strategy: str) -> dict:
+        """Cost of the layout `strategy` would produce now, without writing it."""
+        place_zones = SlottingOptimizer.place_zones if strategy == SLOTTING else WarehouseArranger.place_zones
+        placed = place_zones(WarehouseArranger.zone_products(db))
+        return SlottingOptimizer.evaluate(
+            {zone: placements for zone, (_, _, placements) in placed.items()}, SlottingOptimizer._demand(db)
+        )
+
+    @staticmethod
+    def _demand(db: Session) -> dict:
+        return dict(WarehouseArranger.demand_query(db, ProductInventory.ProductID))
+
+    @staticmethod
+    def rearrange_inventory(db: Session):
+        WarehouseArranger.rearrange_inventory(db, place_zones=SlottingOptimizer.place_zones)
+
+    @staticmethod
+    def rearrange_zone(db: Session, zone: str):
+        """Re-slot one zone from scratch (slotting has no incremental form)."""
+        products = WarehouseArranger.zone_products(db, zone).get(zone, [])
+        zone_layout = WarehouseArranger.layout.zones[zone]
+        placed_zone = WarehouseArranger.run_placement(SlottingOptimizer.place_zone, zone_layout, products)
+        WarehouseArranger.replace_zone(db, zone, products, placed_zone)
@@ -0,0 +1,364 @@
+import gzip
+import json
+import math
+import os
+import re
+import zlib
+from datetime import datetime
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import SNAPSHOT_CHUNK_ROWS, SNAPSHOT_DIR, SNAPSHOT_KEEP
+from app.models.item import ProductInventory, RackCapacity, RackPlacement
+from app.services.alerts import alert_engine
+from app.services.cache import response_cache
+from app.services.serialization import dumps
+
+FORMAT = "warehouse-snapshot"
+VERSION = 1
+SUFFIX = ".ndjson.gz"
+AUTO_PREFIX = "pre-rearrange-"
+NAME_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,100}$")
+
+# Table -> key columns; rows are written in key order and diffed by key.
+# Surrogate ids are left out, so restored racks and placements get new ones.
+TABLES = {
+    ProductInventory.__tablename__: (ProductInventory, ["ProductID"]),
+    RackCapacity.__tablename__: (RackCapacity, ["zone", "shelf", "rack"]),
+    RackPlacement.__tablename__: (RackPlacement, ["ProductID", "zone", "shelf", "rack"]),
+}
+
+def snapshot_columns(table: str) -> List[str]:
+    return [c.name for c in TABLES[table][0].__table__.columns if not (c.primary_key and c.autoincrement is True)]
+
+class SnapshotError(ValueError):
+    pass
+
+class SnapshotReader:
+    """
+    Parses a snapshot line by line.
+
+    The header is read on construction and must list every table with all
+    of its columns, since a restore replaces all three tables. chunks()
+    then yields (table, rows) one chunk line at a time and checks the row
+    counts of the end record, so a truncated file fails instead of
+    restoring part of the warehouse.
+    """
+
+    def __init__(self, lines: Iterable):
+        self._lines = iter(lines)
+        header = self._next()
+        if header is None or header.get('format') != FORMAT:
+            raise SnapshotError("Not a warehouse snapshot")
+        if header.get('version') != VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {header.get('version')}")
+        self.header = header
+        self.columns: Dict[str, List[str]] = header.get('tables') or {}
+        unknown = set(self.columns) - set(TABLES)
+        if unknown:
+            raise SnapshotError(f"Unknown tables: {', '.join(sorted(unknown))}")
+        missing = [table for table in TABLES if table not in self.columns]
+        if missing:
+            raise SnapshotError(f"Missing tables: {', '.join(missing)}")
+        for table, columns in self.columns.items():
+            expected = snapshot_columns(table)
+            extra = set(columns) - set(expected)
+            if extra:
+                raise SnapshotError(f"Unknown {table} columns: {', '.join(sorted(extra))}")
+            absent = [c for c in expected if c not in columns]
+            if absent:
+                raise SnapshotError(f"Missing {table} columns: {', '.join(absent)}")
+            if len(columns) != len(expected):
+                raise SnapshotError(f"Duplicate {table} columns")
+
+    def _next(self) -> Optional[dict]:
+        try:
+            for line in self._lines:
+                if line.strip():
+                    try:
+                        return json.loads(line)
+                    except ValueError as e:
+                        raise SnapshotError(f"Invalid JSON: {e}")
+        except (EOFError, gzip.BadGzipFile, zlib.error) as e:
+            raise SnapshotError(f"Invalid or truncated gzip data: {e}")
+        return None
+
+    def chunks(self) -> Iterator[Tuple[str, List[list]]]:
+        counts = dict.fromkeys(self.columns, 0)
+        while True:
+            record = self._next()
+            if record is None:
+                raise SnapshotError("Snapshot is truncated: no end record")
+            if record.get('end'):
+                break
+            table, rows = record.get('table'), record.get('rows')
+            if table not in self.columns or not isinstance(rows, list):
+                raise SnapshotError(f"Unexpected record for table {table!r}")
+            width = len(self.columns[table])
+            if any(not isinstance(row, list) or len(row) != width for row in rows):
+                raise SnapshotError(f"{table} rows must have {width} values")
+            counts[table] += len(rows)
+            yield table, rows
+        if record.get('rows') != counts:
+            raise SnapshotError(f"Row counts {counts} do not match the end record {record.get('rows')}")
+
+    def tables(self) -> Iterator[Tuple[str, Iterator[list]]]:
+        """
+        (table, rows) for every table of the header, in order, empty ones
+        included. Rows a consumer leaves unread are skipped.
+        """
+        self._chunks = self.chunks()
+        self._pending = next(self._chunks, None)
+        for table in self.columns:
+            yield table, self._rows(table)
+            for _ in self._rows(table):
+                pass
+        if self._pending is not None:
+            raise SnapshotError(f"Rows of {self._pending[0]} are out of table order")
+
+    def _rows(self, table: str) -> Iterator[list]:
+        while self._pending is not None and self._pending[0] == table:
+            rows = self._pending[1]
+            self._pending = next(self._chunks, None)
+            yield from rows
+
+def open_snapshot(file: IO[bytes]) -> IO[bytes]:
+    """Read a snapshot file object, gzipped or not."""
+    magic = file.read(2)
+    file.seek(0)
+    return gzip.GzipFile(fileobj=file, mode="rb") if magic == b"\x1f\x8b" else file
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+class WarehouseSnapshot:
+    """
+    Export, restore and diff the warehouse layout: product_inventory,
+    rack_capacity and rack_placement.
+
+    A snapshot is NDJSON: a header line naming each table's columns, then
+    lines of up to SNAPSHOT_CHUNK_ROWS rows as value arrays, then an end
+    record with the row count of each table. Tables are read with streamed
+    cursors in key order and restored by bulk inserts, so neither side
+    holds a whole table in memory, and two snapshots can be compared table
+    by table. Stored snapshots are gzipped files in SNAPSHOT_DIR.
+    """
+
+    @staticmethod
+    def export(db: Session, chunk_rows: int = SNAPSHOT_CHUNK_ROWS, **header) -> Iterator[bytes]:
+        """Yield the current state as snapshot lines, read in one transaction."""
+        connection = db.connection()
+        # pysqlite only opens transactions for writes; read every table from one snapshot
+        begun = db.bind.dialect.name == "sqlite" and not connection.connection.in_transaction
+        if begun:
+            connection.exec_driver_sql("BEGIN")
+        try:
+            yield dumps({
+                'format': FORMAT,
+                'version': VERSION,
+                'created_at': datetime.utcnow().isoformat(),
+                **header,
+                'tables': {table: snapshot_columns(table) for table in TABLES},
+            }) + b"\n"
+            counts = {}
+            for table, (model, keys) in TABLES.items():
+                columns = model.__table__.c
+                statement = select(*[columns[c] for c in snapshot_columns(table)]).order_by(
+                    *[columns[k] for k in keys]
+                )
+                result = db.execute(statement.execution_options(stream_results=True))
+                counts[table] = 0
+                for rows in result.partitions(chunk_rows):
+                    counts[table] += len(rows)
+                    yield dumps({'table': table, 'rows': [list(row) for row in rows]}) + b"\n"
+            yield dumps({'end': True, 'rows': counts}) + b"\n"
+        finally:
+            if begun:
+                db.rollback()
+
+    @staticmethod
+    def restore(db: Session, lines: Iterable) -> dict:
+        """
+        Replace the three tables with a snapshot's rows in one transaction.
+
+        Nothing is written if the snapshot is invalid or truncated; rows the
+        tables reject (duplicate keys, say) raise SnapshotError too. Quantity
+        changes are not logged as movements: a restore rewinds state rather
+        than moving stock.
+        """
+        reader = SnapshotReader(lines)
+        try:
+            for table in TABLES:
+                db.execute(TABLES[table][0].__table__.delete())
+            counts = dict.fromkeys(TABLES, 0)
+            for table, rows in reader.chunks():
+                if not rows:
+                    # An empty executemany would be a single INSERT of defaults
+                    continue
+                columns = reader.columns[table]
+                db.execute(insert(TABLES[table][0].__table__), [dict(zip(columns, row)) for row in rows])
+                counts[table] += len(rows)
+            db.commit()
+        except (IntegrityError, DataError) as e:
+            # E.g. duplicate keys: the snapshot is invalid, not the server
+            db.rollback()
+            raise SnapshotError(f"Snapshot rows do not fit the tables: {e.orig}")
+        except Exception:
+            db.rollback()
+            raise
+        response_cache.bump()
+        alert_engine.evaluate_all(db)
+        return {'created_at': reader.header.get('created_at'), 'strategy': reader.header.get('strategy'),
+                'rows': counts}
+
+    @staticmethod
+    def diff(old: SnapshotReader, new: SnapshotReader, tables: Optional[List[str]] = None,
+             limit: int = 1000) -> dict:
+        """
+        Rows added, removed and changed between two snapshots, by table key.
+
+        One table of the older snapshot is held in memory at a time while
+        the newer one streams past it. Up to `limit` changes are listed;
+        the per-table counts are always complete.
+        """
+        summary = {}
+        changes = []
+        new_tables = new.tables()
+        for table, old_rows in old.tables():
+            new_table, new_rows = next(new_tables, (None, None))
+            if new_table != table:
+                raise SnapshotError(f"Snapshots list their tables differently: {table} and {new_table}")
+            if tables is not None and table not in tables:
+                continue
+            keys = TABLES[table][1]
+            old_columns, new_columns = old.columns[table], new.columns[table]
+            old_key = [old_columns.index(k) for k in keys]
+            new_key = [new_columns.index(k) for k in keys]
+            shared = [c for c in new_columns if c in old_columns and c not in keys]
+            old_index = [old_columns.index(c) for c in shared]
+            new_index = [new_columns.index(c) for c in shared]
+
+            before = {tuple(row[i] for i in old_key): row for row in old_rows}
+            counts = {'added': 0, 'removed': 0, 'changed': 0}
+            for row in new_rows:
+                key = tuple(row[i] for i in new_key)
+                previous = before.pop(key, None)
+                if previous is None:
+                    counts['added'] += 1
+                    if len(changes) < limit:
+                        changes.append({'table': table, 'change': 'added', 'key': dict(zip(keys, key)),
+                                        'row': dict(zip(new_columns, row))})
+                    continue
+                fields = {
+                    column: [previous[i], row[j]]
+                    for column, i, j in zip(shared, old_index, new_index)
+                    if not WarehouseSnapshot._same(previous[i], row[j])
+                }
+                if fields:
+                    counts['changed'] += 1
+                    if len(changes) < limit:
+                        changes.append({'table': table, 'change': 'changed', 'key': dict(zip(keys, key)),
+                                        'fields': fields})
+            counts['removed'] = len(before)
+            for key, row in before.items():
+                if len(changes) >= limit:
+                    break
+                changes.append({'table': table, 'change': 'removed', 'key': dict(zip(keys, key)),
+                                'row': dict(zip(old_columns, row))})
+            summary[table] = counts
+        # Runs the newer snapshot to its end record
+        for table, _ in new_tables:
+            raise SnapshotError(f"Snapshots list their tables differently: {table} is extra")
+        total = sum(sum(c.values()) for c in summary.values())
+        return {
+            'from': old.header.get('created_at'),
+            'to': new.header.get('created_at'),
+            'tables': summary,
+            'changes': changes,
+            'truncated': total > len(changes),
+        }
+
+    @staticmethod
+    def _same(a, b) -> bool:
+        # Weights are recomputed on every rearrangement; ignore float noise
+        if isinstance(a, float) or isinstance(b, float):
+            return a is not None and b is not None and math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+        return a == b
+
+    @staticmethod
+    def path(name: str) -> str:
+        if not NAME_PATTERN.match(name) or name.startswith("."):
+            raise SnapshotError(f"Invalid snapshot name {name!r}")
+        return os.path.join(SNAPSHOT_DIR, name + SUFFIX)
+
+    @staticmethod
+    def save(db: Session, name: Optional[str] = None, prefix: str = "snapshot-", **header) -> dict:
+        """Write the current state to SNAPSHOT_DIR; returns its listing entry."""
+        name = name or prefix + datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+        path = WarehouseSnapshot.path(name)
+        if os.path.exists(path):
+            raise FileExistsError(f"Snapshot {name} already exists")
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        partial = path + ".partial"
+        try:
+            with gzip.open(partial, "wb", compresslevel=6) as f:
+                for line in WarehouseSnapshot.export(db, **header):
+                    f.write(line)
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        return WarehouseSnapshot.describe(name)
+
+    @staticmethod
+    def open(name: str) -> IO[bytes]:
+        path = WarehouseSnapshot.path(name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Snapshot {name} not found")
+        return gzip.open(path, "rb")
+
+    @staticmethod
+    def describe(name: str) -> dict:
+        stat = os.stat(WarehouseSnapshot.path(name))
+        with WarehouseSnapshot.open(name) as f:
+            header = SnapshotReader(f).header
+        return {
+            'name': name,
+            'created_at': header.get('created_at'),
+            'strategy': header.get('strategy'),
+            'bytes': stat.st_size,
+        }
+
+    @staticmethod
+    def names() -> List[str]:
+        """Stored snapshot names, oldest first."""
+        if not os.path.isdir(SNAPSHOT_DIR):
+            return []
+        paths = [
+            entry for entry in os.scandir(SNAPSHOT_DIR)
+            if entry.is_file() and entry.name.endswith(SUFFIX)
+        ]
+        paths.sort(key=lambda entry: (entry.stat().st_mtime, entry.name))
+        return [entry.name[:-len(SUFFIX)] for entry in paths]
+
+    @staticmethod
+    def delete(name: str):
+        path = WarehouseSnapshot.path(name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Snapshot {name} not found")
+        os.remove(path)
+
+    @staticmethod
+    def prune(prefix: str = AUTO_PREFIX, keep: int = SNAPSHOT_KEEP):
+        """Delete all but the newest `keep` stored snapshots named with `prefix`."""
+        automatic = [name for name in WarehouseSnapshot.names() if name.startswith(prefix)]
+        for name in automatic[:max(len(automatic) - keep, 0)]:
+            WarehouseSnapshot.delete(name)
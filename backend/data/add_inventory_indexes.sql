@@ -0,0 +1,10 @@
+-- Indexes backing the filters and sort keys of GET /api/inventory/ on a
+-- database loaded from the dump, where the string columns are TEXT and need
+-- a prefix length. Tables created by the app get them from the model.
+USE `warehouse`;
+
+ALTER TABLE `product_inventory`
+  ADD INDEX `ix_product_inventory_Category` (`Category`(50)),
+  ADD INDEX `ix_product_inventory_Zone` (`Zone`(1)),
+  ADD INDEX `ix_product_inventory_Quantity` (`Quantity`),
+  ADD INDEX `ix_product_inventory_DemandPastMonth` (`DemandPastMonth`);
@@ -0,0 +1,12 @@
+-- Flag of movements already added to inventory_rollup, for databases created
+-- before it existed. Movements up to the old watermark are marked folded.
+USE `warehouse`;
+
+ALTER TABLE `inventory_movement`
+  ADD COLUMN `folded` BOOL NOT NULL DEFAULT 0,
+  ADD INDEX `ix_inventory_movement_folded` (`folded`);
+
+UPDATE `inventory_movement` m
+  JOIN `rollup_watermark` w ON w.id = 1
+  SET m.folded = 1
+  WHERE m.id <= w.last_movement_id;
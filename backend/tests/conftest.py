@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+# Must be set before app.config is imported: the app binds its engine at import
+TEST_DIR = tempfile.mkdtemp(prefix="warehouse-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}"
+os.environ["SNAPSHOT_DIR"] = os.path.join(TEST_DIR, "snapshots")
+
+import pytest
+from sqlalchemy import insert
+
+from app.database import Base, SessionLocal, engine
+from app.models.item import ProductInventory
+from app.services.arrangement import WarehouseArranger
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        with engine.begin() as connection:
+            for table in reversed(Base.metadata.sorted_tables):
+                connection.execute(table.delete())
+
+def product(product_id: str, quantity: int, category: str = "Electronics", weight: float = 2.0, demand: int = 10) -> dict:
+    """A product_inventory row; Electronics lands in zone B."""
+    return {
+        'ProductID': product_id,
+        'ProductName': f"{category} {product_id}",
+        'Category': category,
+        'Quantity': quantity,
+        'DemandPastMonth': demand,
+        'Price': 9.99,
+        'Zone': "",
+        'ShelfLocation': "",
+        'RackLocation': "",
+        'IndividualWeight_kg': weight,
+        'TotalWeight_kg': quantity * weight,
+    }
+
+def stock(db, *rows):
+    """Insert product rows and place them on the racks."""
+    db.execute(insert(ProductInventory.__table__), list(rows))
+    db.commit()
+    WarehouseArranger.rearrange_inventory(db)
@@ -0,0 +1,35 @@
+from app.services.cache import ResponseCache
+
+def build(data):
+    return lambda: (data, None)
+
+def test_entries_are_bounded_least_recently_used_first():
+    cache = ResponseCache(max_entries=3, max_bytes=10 ** 6)
+    for cursor in range(3):
+        cache.get_or_build(("inventory", cursor), build([cursor]))
+    # Touch the oldest so the next one out is cursor 1
+    cache.get_or_build(("inventory", 0), build(["rebuilt"]))
+    cache.get_or_build(("inventory", 3), build([3]))
+    assert ("inventory", 0) in cache._entries
+    assert ("inventory", 1) not in cache._entries
+    etag, body, _, _ = cache.get_or_build(("inventory", 0), build(["rebuilt"]))
+    assert body == b"[0]"
+    for cursor in range(4, 100):
+        cache.get_or_build(("inventory", cursor), build([cursor]))
+        assert len(cache._entries) <= 3
+    assert list(cache._entries) == [("inventory", 97), ("inventory", 98), ("inventory", 99)]
+
+    etag, body, _, _ = cache.get_or_build(("inventory", 99), build(["rebuilt"]))
+    assert body == b"[99]"
+
+def test_bytes_are_bounded_and_oversized_bodies_not_cached():
+    cache = ResponseCache(max_entries=100, max_bytes=100)
+    cache.get_or_build("big", build("x" * 200))
+    assert "big" not in cache._entries
+    for i in range(10):
+        cache.get_or_build(i, build("y" * 30))
+        assert cache._bytes <= 100
+    assert len(cache._entries) == 3
+
+    cache.bump()
+    assert cache._bytes == 0 and not cache._entries
@@ -0,0 +1,86 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import insert
+
+from app.models.item import InventoryRollup
+from app.services import forecasting
+from app.services.forecasting import DAY, DemandForecaster
+
+START = datetime(2026, 3, 1)
+
+class Clock:
+    now = START
+
+    @classmethod
+    def utcnow(cls):
+        return cls.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(forecasting, "datetime", Clock)
+    return Clock
+
+def picks(db, product_id: str, first_day: int, daily: list):
+    db.execute(insert(InventoryRollup.__table__), [
+        {'bucket': "day", 'bucket_start': START + (first_day + d) * DAY, 'scope': "sku", 'key': product_id,
+         'received': 0, 'picked': int(n), 'adjusted': 0, 'stockouts': 0, 'events': 1 if n else 0}
+        for d, n in enumerate(daily)
+    ])
+    db.commit()
+
+def test_smooth():
+    level, trend, error_var, days = np.zeros(2), np.zeros(2), np.zeros(2), np.zeros(2, dtype=int)
+    picked = np.array([[10.0, 10.0, 10.0], [0.0, 4.0, 8.0]])
+    events = np.array([[1.0, 1.0, 1.0], [0.0, 1.0, 1.0]])
+    new = DemandForecaster.smooth(level, trend, error_var, days, picked, events)
+
+    # A steady SKU stays at its first day's level; the second starts on day 1
+    # and moves a third of the way to its 4-unit error
+    np.testing.assert_allclose(new[0], [10.0, 5.2])
+    np.testing.assert_allclose(new[1], [0.0, 0.12])
+    np.testing.assert_allclose(new[2], [0.0, 4.8])
+    assert list(new[3]) == [3, 2]
+    # The inputs are left alone
+    assert not level.any() and not days.any()
+
+def test_incremental_updates_match_a_full_rebuild(db, clock):
+    rng = np.random.default_rng(7)
+    picks(db, "P0001", 0, list(rng.integers(0, 20, 40)))
+    picks(db, "P0002", 5, list(rng.integers(0, 5, 35)))
+    # Only shows up after the first update
+    picks(db, "P0003", 28, list(rng.integers(1, 9, 12)))
+
+    clock.now = START + 25 * DAY
+    incremental = DemandForecaster(history_days=25)
+    incremental.update(db)
+    assert incremental.through == START + 24 * DAY
+    for day in (30, 31, 40):
+        clock.now = START + day * DAY
+        incremental.update(db)
+
+    full = DemandForecaster(history_days=40)
+    full.update(db, full=True)
+    assert incremental.through == full.through
+    assert incremental.product_ids == full.product_ids == ["P0001", "P0002", "P0003"]
+    for a, b in zip(incremental.forecasts(), full.forecasts()):
+        assert a == pytest.approx(b)
+
+def test_readers_keep_the_old_state_during_a_rebuild(db, clock, monkeypatch):
+    picks(db, "P0001", 0, [5] * 10)
+    clock.now = START + 10 * DAY
+    forecaster = DemandForecaster(history_days=10)
+    forecaster.update(db)
+    before = forecaster.forecasts()
+    seen = []
+    history = DemandForecaster._history
+
+    def watched(self, *args):
+        seen.append(self.forecasts())
+        return history(self, *args)
+
+    monkeypatch.setattr(DemandForecaster, "_history", watched)
+    forecaster.update(db, full=True)
+    assert seen == [before]
+    assert forecaster.forecasts() == before
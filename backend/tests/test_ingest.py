@@ -0,0 +1,35 @@
+import asyncio
+
+from app.services.ingest import iter_records
+
+MANIFEST = (
+    'ProductID,ProductName,Category\r\n'
+    'P0001,Monitor 27" wide,Electronics\r\n'
+    'P0002,"Desk lamp\r\nwith ""dimmer""",Home\r\n'
+    'P0003,Cable,Electronics\r\n'
+    'P0004,"Unterminated,Home\n'
+).encode()
+
+def records(body: bytes, chunk_size: int) -> list:
+    async def chunks():
+        for i in range(0, len(body), chunk_size):
+            yield body[i:i + chunk_size]
+
+    async def collect():
+        return [pair async for pair in iter_records(chunks(), "csv")]
+
+    # Not asyncio.run, which leaves no current event loop for TestClient
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(collect())
+    finally:
+        loop.close()
+
+def test_csv_records_follow_the_csv_module():
+    for chunk_size in (1, 7, len(MANIFEST)):
+        assert records(MANIFEST, chunk_size) == [
+            (1, {'ProductID': "P0001", 'ProductName': 'Monitor 27" wide', 'Category': "Electronics"}),
+            (2, {'ProductID': "P0002", 'ProductName': 'Desk lamp\nwith "dimmer"', 'Category': "Home"}),
+            (3, {'ProductID': "P0003", 'ProductName': "Cable", 'Category': "Electronics"}),
+            (4, "Unterminated quoted field"),
+        ]
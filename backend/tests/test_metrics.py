@@ -0,0 +1,23 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.metrics import debug_router
+from app.main import app
+from app.services.profiler import profiler
+
+def test_debug_endpoints_are_off_by_default():
+    client = TestClient(app)
+    assert client.get("/debug/profiles").status_code == 404
+    assert client.put("/debug/profiler", params={'threshold_ms': 1}).status_code == 404
+    assert profiler.threshold_ms == 0
+
+def test_debug_endpoints_when_enabled():
+    debug_app = FastAPI()
+    debug_app.include_router(debug_router)
+    client = TestClient(debug_app)
+    try:
+        response = client.put("/debug/profiler", params={'threshold_ms': 500})
+        assert response.status_code == 200
+        assert client.get("/debug/profiles").json()['threshold_ms'] == 500
+    finally:
+        profiler.configure(0)
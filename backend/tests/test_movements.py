@@ -0,0 +1,83 @@
+import threading
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app.database import SessionLocal
+from app.models.item import InventoryMovement, InventoryRollup, RollupWatermark
+from app.services.movements import MovementLog
+
+def movement(quantity_delta: int, movement_id: int = None) -> dict:
+    row = {
+        'ProductID': "P0001",
+        'Category': "Electronics",
+        'Zone': "B",
+        'kind': "pick",
+        'quantity_delta': quantity_delta,
+        'quantity_after': 50,
+        'created_at': datetime(2026, 1, 5, 10, 30),
+    }
+    if movement_id is not None:
+        row['id'] = movement_id
+    return row
+
+def sku_day(db):
+    return db.query(InventoryRollup).filter(
+        InventoryRollup.bucket == "day", InventoryRollup.scope == "sku", InventoryRollup.key == "P0001"
+    ).one()
+
+def test_movement_committed_after_a_higher_id_was_folded(db):
+    # Two writers: the one holding id 10 commits first and is folded
+    # before the one holding id 5 commits
+    db.execute(insert(InventoryMovement.__table__), [movement(-3, movement_id=10)])
+    db.commit()
+    assert MovementLog.fold(db) == 1
+
+    db.execute(insert(InventoryMovement.__table__), [movement(-4, movement_id=5)])
+    db.commit()
+    assert MovementLog.fold(db) == 1
+    assert MovementLog.fold(db) == 0
+
+    rollup = sku_day(db)
+    assert (rollup.picked, rollup.events) == (7, 2)
+    assert db.query(RollupWatermark.last_movement_id).scalar() == 10
+
+def test_concurrent_folds_count_each_movement_once(db):
+    db.execute(insert(InventoryMovement.__table__), [movement(-1) for _ in range(200)])
+    db.commit()
+    # No watermark row yet: every fold races to create it
+    assert db.query(RollupWatermark).count() == 0
+    folded, errors = [], []
+    start = threading.Barrier(8)
+
+    def fold():
+        session = SessionLocal()
+        try:
+            start.wait()
+            folded.append(MovementLog.fold(session))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=fold) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sum(folded) == 200
+    db.expire_all()
+    assert sku_day(db).events == 200
+    assert db.query(InventoryMovement).filter(InventoryMovement.folded.is_(False)).count() == 0
+
+def test_fold_leaves_the_callers_transaction_alone(db):
+    db.execute(insert(InventoryMovement.__table__), [movement(-2)])
+    db.commit()
+    db.add(InventoryMovement(**movement(-5)))
+    assert MovementLog.fold(db) == 1
+
+    db.rollback()
+    assert db.query(InventoryMovement).count() == 1
+    assert sku_day(db).picked == 2
@@ -0,0 +1,68 @@
+import threading
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func
+
+from app.database import SessionLocal
+from app.main import app
+from app.models.item import InventoryMovement, ProductInventory, RackCapacity, RackPlacement
+from app.services.picking import Picker
+from app.services.scheduler import ArrangementScheduler, scheduler
+from tests.conftest import product, stock
+
+def test_concurrent_picks_never_oversell(db):
+    stock(db, product("P0001", 100))
+    outcomes = []
+    start = threading.Barrier(60)
+
+    def picker():
+        session = SessionLocal()
+        try:
+            start.wait()
+            results, _ = Picker.pick(session, [{'ProductID': "P0001", 'quantity': 3}])
+            outcomes.append(results[0]['picked'])
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=picker) for _ in range(60)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db.expire_all()
+    assert outcomes.count(True) == 33
+    assert db.query(ProductInventory.Quantity).filter(ProductInventory.ProductID == "P0001").scalar() == 1
+    # The racks released exactly the units picked
+    assert db.query(func.sum(RackPlacement.quantity)).filter(RackPlacement.ProductID == "P0001").scalar() == 1
+    assert db.query(func.sum(RackCapacity.used_weight)).scalar() == 2.0
+    assert db.query(func.sum(InventoryMovement.quantity_delta)).scalar() == -99
+
+def test_picks_do_not_wait_for_rearrangements(db):
+    stock(db, product("P0001", 10))
+    with TestClient(app) as client:
+        # As if a full rearrangement or a restore were running
+        with scheduler.arrange_lock:
+            response = client.patch("/api/inventory/retrieve/P0001", params={'quantity': 4, 'wait': 'true'})
+        assert response.status_code == 200
+        assert response.json()['Quantity'] == 6
+        assert int(response.headers["X-Arrangement-Generation"]) <= scheduler.completed_generation
+
+        response = client.post("/api/inventory/pick", json={'lines': [{'ProductID': "P0001", 'quantity': 100}]})
+        assert response.status_code == 200
+        assert response.json()[0]['picked'] is False
+
+def test_pick_overlapping_a_rearrangement_reschedules_its_zone(db):
+    stock(db, product("P0001", 10))
+    local = ArrangementScheduler(window=60.0)
+
+    token = local.pick_token()
+    generation = local.after_pick(token, "B", "P0001", 10)
+    assert generation == 0
+    assert local.status()['pending_zones'] == []
+
+    token = local.pick_token()
+    local.rearrange_all(db)
+    generation = local.after_pick(token, "B", "P0001", 10)
+    assert generation == 1
+    assert local.status()['pending_zones'] == ["B"]
@@ -0,0 +1,55 @@
+from app.services.arrangement import WarehouseArranger
+from app.services.scheduler import ArrangementScheduler
+
+def test_failed_zone_stays_pending_and_is_retried(db, monkeypatch):
+    attempts = []
+
+    def rearrange_zone_batch(db, zone, changes):
+        attempts.append(dict(changes))
+        if len(attempts) == 1:
+            raise RuntimeError("deadlock")
+
+    monkeypatch.setattr(WarehouseArranger, "rearrange_zone_batch", staticmethod(rearrange_zone_batch))
+    scheduler = ArrangementScheduler(window=0.0)
+    scheduler.RETRY_SECONDS = 0.3
+    scheduler.start()
+    try:
+        generation = scheduler.mark_dirty("A", "P1", 5)
+        # The failed attempt must not complete the generation
+        assert not scheduler.wait_for(generation, 0.2)
+        status = scheduler.status()
+        assert status['completed_generation'] < generation
+        assert status['pending_zones'] == ["A"]
+        assert status['failed_zones']["A"]['attempts'] == 1
+        assert "deadlock" in status['failed_zones']["A"]['error']
+        assert "failing zones: A" in scheduler.timeout_detail(generation)
+
+        # A write arriving before the retry is merged into it
+        later = scheduler.mark_dirty("A", "P2", 7)
+        assert scheduler.wait_for(later, 5)
+        assert attempts[-1] == {'P1': 5, 'P2': 7}
+        assert scheduler.status()['failed_zones'] == {}
+    finally:
+        scheduler.stop()
+
+def test_failing_zone_does_not_hold_back_other_zones(db, monkeypatch):
+    def rearrange_zone_batch(db, zone, changes):
+        if zone == "A":
+            raise RuntimeError("deadlock")
+
+    monkeypatch.setattr(WarehouseArranger, "rearrange_zone_batch", staticmethod(rearrange_zone_batch))
+    scheduler = ArrangementScheduler(window=0.0)
+    scheduler.RETRY_SECONDS = 60.0
+    scheduler.start()
+    try:
+        failing = scheduler.mark_dirty("A", "P1", 5)
+        assert not scheduler.wait_for(failing, 0.2)
+        assert scheduler.status()['failed_zones']["A"]['attempts'] == 1
+
+        # Zone B completes while A backs off
+        other = scheduler.mark_dirty("B", "P2", 7)
+        assert scheduler.wait_for(other, 5)
+        assert not scheduler.wait_for(failing, 0)
+        assert scheduler.status()['completed_generation'] < failing
+    finally:
+        scheduler.stop()
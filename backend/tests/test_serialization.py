@@ -0,0 +1,26 @@
+from datetime import datetime
+from decimal import Decimal
+
+from pydantic import BaseModel
+
+from app.services.serialization import dumps
+
+class Row(BaseModel):
+    name: str
+    weight: float
+
+def test_dumps_writes_compact_utf8_json():
+    data = {
+        'names': ["Café", "日本", "tab\t\"quote\""],
+        'floats': [1e20, 0.1, float("nan"), float("inf")],
+        'other': [12, True, None, Decimal("1.5"), datetime(2026, 1, 5, 10, 30)],
+        1: (1, 2),
+        'model': Row(name="Crème", weight=2.5),
+    }
+    assert dumps(data) == (
+        '{"names":["Café","日本","tab\\t\\"quote\\""],'
+        '"floats":[1e+20,0.1,null,null],'
+        '"other":[12,true,null,1.5,"2026-01-05T10:30:00"],'
+        '"1":[1,2],'
+        '"model":{"name":"Crème","weight":2.5}}'
+    ).encode()
@@ -0,0 +1,102 @@
+import gzip
+import json
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.item import ProductInventory, RackPlacement
+from app.services.snapshots import SnapshotError, WarehouseSnapshot
+from tests.conftest import product, stock
+
+def state(db):
+    db.expire_all()
+    return (
+        sorted((p.ProductID, p.Quantity) for p in db.query(ProductInventory)),
+        sorted((r.ProductID, r.zone, r.shelf, r.rack, r.quantity) for r in db.query(RackPlacement)),
+    )
+
+def exported(db) -> list:
+    return [json.loads(line) for line in WarehouseSnapshot.export(db, chunk_rows=1)]
+
+def lines(records) -> list:
+    return [json.dumps(record).encode() + b"\n" for record in records]
+
+@pytest.fixture
+def snapshot(db):
+    # Taken with two products, then the warehouse moves on to a third
+    stock(db, product("P0001", 10), product("P0002", 20))
+    records = exported(db)
+    stock(db, product("P0003", 30))
+    return records
+
+def test_restore_replaces_every_table(db, snapshot):
+    report = WarehouseSnapshot.restore(db, lines(snapshot))
+    assert report['rows']['product_inventory'] == 2
+    products, placements = state(db)
+    assert products == [("P0001", 10), ("P0002", 20)]
+    assert {p[0] for p in placements} == {"P0001", "P0002"}
+
+def test_truncated_snapshot_changes_nothing(db, snapshot):
+    before = state(db)
+    with pytest.raises(SnapshotError, match="truncated"):
+        WarehouseSnapshot.restore(db, lines(snapshot[:-2]))
+    assert state(db) == before
+
+@pytest.mark.parametrize("drop", ["table", "column"])
+def test_partial_snapshot_is_rejected(db, snapshot, drop):
+    header = snapshot[0]
+    if drop == "table":
+        del header['tables']['rack_placement']
+        records = [header] + [r for r in snapshot[1:] if r.get('table') != "rack_placement"]
+        records[-1]['rows'].pop('rack_placement')
+    else:
+        header['tables']['product_inventory'].remove("Price")
+        records = snapshot
+    before = state(db)
+    with pytest.raises(SnapshotError, match="Missing"):
+        WarehouseSnapshot.restore(db, lines(records))
+    assert state(db) == before
+
+def test_import_restores_a_gzipped_upload(db, snapshot):
+    body = gzip.compress(b"".join(lines(snapshot)))
+    with TestClient(app) as client:
+        response = client.post("/api/snapshots/import", data=body)
+        assert response.status_code == 200
+        assert response.json()['rows']['product_inventory'] == 2
+
+        response = client.post("/api/snapshots/import", data=b"".join(lines(snapshot[:-1])))
+        assert response.status_code == 400
+    assert state(db)[0] == [("P0001", 10), ("P0002", 20)]
+
+def test_empty_chunks_insert_nothing(db, snapshot):
+    records = snapshot[:1] + [{'table': table, 'rows': []} for table in snapshot[0]['tables']] + snapshot[1:]
+    WarehouseSnapshot.restore(db, lines(records))
+    products, placements = state(db)
+    assert products == [("P0001", 10), ("P0002", 20)]
+    assert all(p[0] is not None for p in placements)
+
+def test_invalid_uploads_are_client_errors(db, snapshot):
+    before = state(db)
+    # The first product twice (one row per chunk), with the end count to match
+    first = next(i for i, r in enumerate(snapshot) if r.get('table') == "product_inventory")
+    end = snapshot[-1]
+    counts = {**end['rows'], 'product_inventory': end['rows']['product_inventory'] + 1}
+    duplicate = snapshot[:first + 1] + snapshot[first:-1] + [{**end, 'rows': counts}]
+    body = gzip.compress(b"".join(lines(snapshot)))
+
+    with TestClient(app) as client:
+        response = client.post("/api/snapshots/import", data=body[:len(body) // 2])
+        assert response.status_code == 400
+        assert "gzip" in response.json()['detail']
+
+        response = client.post("/api/snapshots/import", data=b"".join(lines(duplicate)))
+        assert response.status_code == 400
+        assert "do not fit" in response.json()['detail']
+
+        os.makedirs(os.path.dirname(WarehouseSnapshot.path("duplicate")), exist_ok=True)
+        with gzip.open(WarehouseSnapshot.path("duplicate"), "wb") as f:
+            f.writelines(lines(duplicate))
+        assert client.post("/api/snapshots/duplicate/restore").status_code == 400
+    assert state(db) == before
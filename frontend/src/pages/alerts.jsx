@@ -14,35 +14,24 @@ import './alerts.css';
 const Alerts = () => {
   const [alerts, setAlerts] = useState([]);
   useEffect(() => {
-    fetch('http://localhost:8000/api/inventory/')
-      .then(res => res.json())
-      .then(data => {
-        const generatedAlerts = data.map(item => {
-          if (item.Quantity < 50) {
-            return {
-              id: item.ProductID,
-              type: 'low-stock',
-              title: 'Critical Stock Alert',
-              item: `${item.ProductName} (SKU: ${item.ProductID})`,
-              message: `Only ${item.Quantity} units remaining (critical threshold: 50)`,
-              priority: 'critical',
-              resolved: false
-            };
-          } else if (item.Quantity < 250) {
-            return {
-              id: item.ProductID,
-              type: 'low-stock',
-              title: 'Low Stock Alert',
-              item: `${item.ProductName} (SKU: ${item.ProductID})`,
-              message: `Only ${item.Quantity} units remaining (low stock threshold: 250)`,
-              priority: 'warning',
-              resolved: false
-            };
-          }
-          return null;
-        }).filter(Boolean);
-        setAlerts(generatedAlerts);
-      });
+    // The backend keeps the active alert set and pushes every change
+    const socket = new WebSocket('ws://localhost:8000/api/alerts/ws');
+    socket.onmessage = (event) => {
+      const data = JSON.parse(event.data);
+      if (data.type === 'snapshot') {
+        setAlerts(data.alerts);
+      } else if (data.type === 'resolved') {
+        setAlerts(prev => prev.filter(alert => alert.id !== data.alert.id));
+      } else {
+        setAlerts(prev => [data.alert, ...prev.filter(alert => alert.id !== data.alert.id)]);
+      }
+    };
+    socket.onerror = () => {
+      fetch('http://localhost:8000/api/alerts/')
+        .then(res => res.json())
+        .then(data => setAlerts(data));
+    };
+    return () => socket.close();
   }, []);
 
   // Unread alerts count